@@ -2,6 +2,7 @@
 
 from sage.all import *
 import cubical_complex
+from tracing import phase
 import itertools
 import logging
 import collections
@@ -239,7 +240,11 @@ def downstream_cubes(point_config, T):
     cubes = []
     # This product contains all possible combinations of moves
     for move in itertools.product(*downstream_moves(point_config, T)):
-        new_cube = []
+        # The cube is built directly from its lower corner and the bitmask of
+        # its nondegenerate intervals: moves go between adjacent vertices of
+        # the tree, so every interval is valid and validation can be skipped.
+        lower = []  # (each cube has 3n intervals)
+        mask = 0
         for (next_pos, current_pos) in zip(move, point_config):
             # This point's current position in R^3
             embedded_coords = lookup_[current_pos]
@@ -247,26 +252,26 @@ def downstream_cubes(point_config, T):
 
             # TODO: what's going on here??
             if next_pos is None:
-                intervals = [[u, u] for u in embedded_coords]
+                next_embedded_coords = embedded_coords
             else:
                 # This point's position in R^3 after the move
                 next_embedded_coords = lookup_[next_pos]
-                intervals = [
-                    sorted((u, v))
-                    for (u, v) in zip(embedded_coords, next_embedded_coords)
-                ]
-            new_cube.extend(intervals)  # (each cube has 3n intervals)
+            for (u, v) in zip(embedded_coords, next_embedded_coords):
+                if u != v:
+                    mask |= 1 << len(lower)
+                lower.append(min(u, v))
 
         # Make a new "tagged" cube
         cubes.append(
-            MoveCube(point_config, move, cubical_complex.Cube(new_cube)))
+            MoveCube(point_config, move,
+                     cubical_complex.Cube._from_corner(tuple(lower), mask)))
 
     assert cubes != []
 
     return cubes
 
 
-def the_complex(n, maximality_check=True, logger=logger):
+def the_complex(n, maximality_check=True, logger=logger, trace=None):
     """ Build the cubical complex that is the Abrams-discretized configuration
     space of n vertices on the Y graph.
 
@@ -274,6 +279,9 @@ def the_complex(n, maximality_check=True, logger=logger):
     intentionally only add maximal cells to the complex with downstream_moves.
     This is not currently the case.
 
+    If trace is a homology.tracing.Trace, it counts the generated "cubes" by
+    dimension and times the phases "cubes" and "complex".
+
     Examples:
 
         # TODO: this fails:
@@ -298,32 +306,40 @@ def the_complex(n, maximality_check=True, logger=logger):
 
     T = generate_tree(n)
     cubes = []
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     # If any of the points are at the ends of the legs, then the
     # generated cube will be a face of one already generated.
-    for point_config in iterate_over_conf(T, n):
-        logger.debug("Generating downstream_cubes for {}".format(point_config))
-        downstream = downstream_cubes(point_config, T)
-
-        # for down in downstream:
-        #     for cube in cubes:
-        #         if down.cube.is_face(cube.cube):
-        #             try:
-        #                 assert 2 * n - 2 in point_config or 3 * n - 3 in point_config
-        #             except AssertionError:
-        #                 print("ERRR: the first contains the second")
-        #                 print("cube.point_config: {}".format(cube.point_config))
-        #                 print("cube.move: {}".format(cube.move))
-        #                 print("cube.cube: {}".format(cube.cube))
-        #                 print("down.point_config: {}".format(down.point_config))
-        #                 print("down.move: {}".format(down.move))
-        #                 print("down.cube: {}".format(down.cube))
-        #                 raise
-
-        cubes.extend(downstream)
-
-    cubes = map(lambda t: t.cube, cubes)
-    downstream = map(lambda x: x.cube, downstream)
-
-    return cubical_complex.CubicalComplex(
-        cubes, maximality_check=maximality_check)
+    with phase(trace, "cubes"):
+        for point_config in iterate_over_conf(T, n):
+            if debug:
+                logger.debug("Generating downstream_cubes for %s",
+                             point_config)
+            downstream = downstream_cubes(point_config, T)
+            if trace is not None:
+                for tagged in downstream:
+                    trace.count("cubes", tagged.cube.dimension())
+
+            # for down in downstream:
+            #     for cube in cubes:
+            #         if down.cube.is_face(cube.cube):
+            #             try:
+            #                 assert 2 * n - 2 in point_config or 3 * n - 3 in point_config
+            #             except AssertionError:
+            #                 print("ERRR: the first contains the second")
+            #                 print("cube.point_config: {}".format(cube.point_config))
+            #                 print("cube.move: {}".format(cube.move))
+            #                 print("cube.cube: {}".format(cube.cube))
+            #                 print("down.point_config: {}".format(down.point_config))
+            #                 print("down.move: {}".format(down.move))
+            #                 print("down.cube: {}".format(down.cube))
+            #                 raise
+
+            cubes.extend(downstream)
+
+        cubes = map(lambda t: t.cube, cubes)
+        downstream = map(lambda x: x.cube, downstream)
+
+    with phase(trace, "complex"):
+        return cubical_complex.CubicalComplex(
+            cubes, maximality_check=maximality_check)
@@ -75,10 +75,503 @@ from sage.rings.integer_ring import ZZ
 from sage.rings.rational_field import QQ
 from sage.matrix.constructor import matrix
 from sage.homology.chain_complex import ChainComplex
+from sage.homology.homology_group import HomologyGroup
+from sage.rings.finite_rings.finite_field_constructor import GF
 from sage.graphs.graph import Graph
 from sage.misc.cachefunc import cached_method
 from sage.misc.decorators import rename_keyword
 from functools import total_ordering
+from collections import deque
+import hashlib
+import itertools
+import os
+import tempfile
+import numpy
+import scipy.sparse
+
+# Memoization of the primary faces of cubes: see ``Cube.faces`` and
+# ``set_face_cache_size``.  ``None`` means that every cube keeps its
+# faces, ``0`` that no cube does; a positive integer bounds the number
+# of cubes holding on to their faces, the oldest being dropped first.
+_DEFAULT_FACE_CACHE_SIZE = 4096
+_face_cache_size = _DEFAULT_FACE_CACHE_SIZE
+_face_cache_queue = deque()
+
+
+def set_face_cache_size(size=_DEFAULT_FACE_CACHE_SIZE):
+    """
+    Control the memory used by memoized face lists.
+
+    :param size: ``None`` to memoize the faces of every cube for as
+      long as the cube lives, ``0`` to turn memoization off, or a
+      positive integer to keep the faces of at most that many cubes
+    :type size: optional, default 4096
+
+    Memoized faces are ``Cube`` objects, and they keep their own
+    memoized faces alive in turn, so with ``None`` any traversal of
+    the faces of a complex pins its whole face lattice in memory for
+    as long as its cubes live.  The default bound keeps the faces of
+    the cubes used most recently, which is what repeated lookups such
+    as collapses need, with a fixed memory cost; a larger bound, or
+    ``None``, trades memory for fewer recomputations.
+
+    This only affects face lists computed after the call.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube, set_face_cache_size
+        >>> set_face_cache_size(0)
+        >>> C = Cube([[1,2], [3,4]])
+        >>> C.faces() is C.faces()
+        False
+        >>> set_face_cache_size()
+        >>> C.faces() is C.faces()
+        True
+    """
+    global _face_cache_size
+    _face_cache_size = size
+    _face_cache_queue.clear()
+
+
+# Directory of the on-disk cache of boundary matrices: see
+# ``set_boundary_cache_dir``.  ``None`` means no on-disk cache.
+_boundary_cache_dir = None
+
+
+def set_boundary_cache_dir(directory=None):
+    """
+    Keep the boundary matrices of cubical complexes in a directory,
+    so that other processes computing with the same complexes can
+    reuse them.
+
+    :param directory: path of the cache directory, which is created
+      if needed, or ``None`` to turn the on-disk cache off
+    :type directory: optional, default None
+
+    Each complex gets a subdirectory named after a fingerprint of
+    its set of maximal cells (and of the subcomplex, for relative
+    chain complexes).  Each boundary matrix is stored in CSC form as
+    three ``.npy`` files, which are memory-mapped when loaded, so a
+    complex whose matrices are all cached computes neither its cells
+    nor its boundary matrices.
+
+    EXAMPLES::
+
+        >>> import tempfile
+        >>> from sage.homology.cubical_complex import set_boundary_cache_dir
+        >>> set_boundary_cache_dir(tempfile.mkdtemp())
+        >>> cubical_complexes.Sphere(2).chain_complex()
+        Chain complex with at most 3 nonzero terms over Integer Ring
+        >>> S2 = cubical_complexes.Sphere(2)
+        >>> S2.chain_complex()
+        Chain complex with at most 3 nonzero terms over Integer Ring
+        >>> S2._codes
+        {}
+        >>> set_boundary_cache_dir()
+    """
+    global _boundary_cache_dir
+    if directory is not None and not os.path.isdir(directory):
+        os.makedirs(directory)
+    _boundary_cache_dir = directory
+
+
+def _save_boundary(directory, dim, mat):
+    """
+    Store the boundary matrix ``mat`` from dimension ``dim`` in
+    ``directory``; see :func:`set_boundary_cache_dir`.
+
+    Each file is written under a temporary name and then renamed, so
+    concurrent readers never see a partial file.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    arrays = [("indptr", mat.indptr), ("indices", mat.indices),
+              ("data", mat.data), ("shape", numpy.array(mat.shape))]
+    # the shape is written last: it marks the matrix as complete
+    for (name, array) in arrays:
+        (handle, path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            numpy.save(f, array)
+        os.rename(path, os.path.join(directory, "%s-%s.npy" % (dim, name)))
+
+
+def _load_boundary(directory, dim):
+    """
+    Load the boundary matrix from dimension ``dim`` stored in
+    ``directory`` by :func:`_save_boundary`, memory-mapping its
+    arrays, or return ``None`` if it is not there.
+    """
+    def path(name):
+        return os.path.join(directory, "%s-%s.npy" % (dim, name))
+    if not os.path.exists(path("shape")):
+        return None
+    shape = tuple(numpy.load(path("shape")).tolist())
+    (indptr, indices, data) = [numpy.load(path(name), mmap_mode="r")
+                               for name in ("indptr", "indices", "data")]
+    return scipy.sparse.csc_matrix((data, indices, indptr), shape=shape,
+                                   copy=False)
+
+
+def _encode_cubes(cubes, width=None):
+    """
+    Pack cubes into a NumPy array of integers, one row per cube.
+
+    :param cubes: list of cubes
+    :param width: number of columns; at least one more than the
+      number of intervals of each cube
+    :type width: optional, default the smallest possible width
+    :return: two-dimensional ``int64`` array
+
+    Column 0 holds the number of intervals of the cube, and column
+    ``i+1`` holds ``2a`` if the ``i``-th interval is ``[a,a]``,
+    ``2a+1`` if it is ``[a,a+1]``: this packs the coordinates and the
+    nondegeneracy mask into one integer per interval, and sorting the
+    codes sorts the intervals.  Shorter cubes are padded with zeros.
+    Raise ``OverflowError`` if some code does not fit in 64 bits.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _encode_cubes([Cube([[1,2], [5,]]), Cube([[0,1]])])
+        array([[ 2,  3, 10],
+               [ 1,  1,  0]])
+    """
+    lengths = [len(cube._lower) for cube in cubes]
+    if width is None:
+        width = 1 + max(lengths + [0])
+    rows = []
+    for (cube, length) in zip(cubes, lengths):
+        mask = cube._mask
+        rows.append([length] +
+                    [2*a + (mask >> i & 1) for (i, a) in enumerate(cube._lower)] +
+                    [0] * (width - 1 - length))
+    return numpy.array(rows, dtype=numpy.int64).reshape(len(rows), width)
+
+
+def _decode_cubes(codes):
+    """
+    Turn the rows of an array produced by :func:`_encode_cubes` back
+    into cubes.
+
+    :param codes: two-dimensional array of packed cubes
+    :return: list of cubes, one for each row
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _decode_cubes(_encode_cubes([Cube([[1,2], [5,]]), Cube([[0,1]])]))
+        [[1,2] x [5,5], [0,1]]
+    """
+    intervals = codes[:, 1:]
+    if intervals.shape[1] < 63:
+        weights = numpy.left_shift(1, numpy.arange(intervals.shape[1],
+                                                   dtype=numpy.int64))
+    else:
+        weights = numpy.array([1 << i for i in range(intervals.shape[1])],
+                              dtype=object)
+    masks = ((intervals & 1) * weights).sum(axis=1).tolist()
+    lowers = (intervals >> 1).tolist()
+    make = Cube._from_corner
+    return [make(tuple(lower[:length]), int(mask)) for (length, lower, mask)
+            in zip(codes[:, 0].tolist(), lowers, masks)]
+
+
+def _code_dimensions(codes):
+    """
+    The dimensions of the cubes packed in ``codes``: the number of
+    odd interval codes, or -1 for the empty cube.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _code_dimensions(_encode_cubes([Cube([[1,2], [5,]]), Cube(())]))
+        array([ 1, -1])
+    """
+    dims = (codes[:, 1:] & 1).sum(axis=1)
+    dims[codes[:, 0] == 0] = -1
+    return dims
+
+
+def _code_faces(codes):
+    """
+    All primary faces of the cubes packed in ``codes``, as packed
+    cubes, in no particular order and possibly with repetitions.
+
+    A nondegenerate interval has an odd code ``2a+1``, and its two
+    endpoints have the codes ``2a`` and ``2a+2``: the faces of all
+    cubes are produced by one pass per column.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _code_faces(_encode_cubes([Cube([[1,2], [5,]])]))
+        array([[ 2,  2, 10],
+               [ 2,  4, 10]])
+    """
+    faces = [codes[:0]]
+    for j in range(1, codes.shape[1]):
+        rows = codes[codes[:, j] & 1 == 1]
+        if len(rows):
+            upper = rows.copy()
+            rows[:, j] -= 1
+            upper[:, j] += 1
+            faces += [rows, upper]
+    return numpy.concatenate(faces)
+
+
+def _pad_codes(codes, width):
+    """
+    Widen an array of packed cubes to ``width`` columns by padding
+    with zeros.
+    """
+    if codes.shape[1] >= width:
+        return codes
+    padding = numpy.zeros((len(codes), width - codes.shape[1]),
+                          dtype=codes.dtype)
+    return numpy.hstack([codes, padding])
+
+
+def _row_index(table, rows):
+    """
+    Find rows in a table of distinct rows.
+
+    :param table: two-dimensional array with distinct rows
+    :param rows: two-dimensional array with as many columns as ``table``
+    :return: integer array whose ``i``-th entry is the index of
+      ``rows[i]`` in ``table``, or -1 if it is not there
+
+    EXAMPLES::
+
+        >>> import numpy
+        >>> _row_index(numpy.array([[0, 1], [2, 3]]), numpy.array([[2, 3], [1, 1]]))
+        array([ 1, -1])
+    """
+    _, inverse = numpy.unique(numpy.concatenate([table, rows]), axis=0,
+                              return_inverse=True)
+    inverse = inverse.reshape(-1)
+    position = numpy.full(inverse.max() + 1 if len(inverse) else 0, -1,
+                          dtype=numpy.int64)
+    position[inverse[:len(table)]] = numpy.arange(len(table))
+    return position[inverse[len(table):]]
+
+
+def _iter_face_closure(codes, bottom=-1):
+    """
+    The packed cells of the cubical complex with the given packed
+    maximal cubes, one dimension at a time.
+
+    :param codes: array of cubes packed by :func:`_encode_cubes`
+    :param bottom: the lowest dimension to compute
+    :type bottom: integer; optional, default -1
+    :return: iterator of pairs ``(dim, cells)``, from the top dimension
+      down to ``bottom``, where ``cells`` is an array of the distinct
+      packed cells of dimension ``dim``, sorted by row
+
+    The cells of each dimension are the cubes of that dimension in
+    ``codes`` together with the faces of the cells one dimension up,
+    and the faces of a whole dimension are produced in one batch by
+    :func:`_code_faces` and deduplicated with ``numpy.unique``.  Only
+    the cells of the current dimension are held.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> [(dim, len(cells)) for (dim, cells)
+        ...  in _iter_face_closure(_encode_cubes([Cube([[0,1]])]))]
+        [(1, 1), (0, 2), (-1, 0)]
+    """
+    dims = _code_dimensions(codes)
+    top = int(dims.max()) if len(dims) else -1
+    current = codes[:0]
+    for dim in range(top, bottom - 1, -1):
+        current = numpy.unique(numpy.concatenate([current, codes[dims == dim]]),
+                               axis=0)
+        yield (dim, current)
+        if dim > bottom:
+            current = _code_faces(current)
+
+
+def _face_closure(codes, bottom=-1):
+    """
+    The packed cells of the cubical complex with the given packed
+    maximal cubes.
+
+    :param codes: array of cubes packed by :func:`_encode_cubes`
+    :param bottom: the lowest dimension to compute
+    :type bottom: integer; optional, default -1
+    :return: dictionary keyed by dimension, from the top dimension
+      down to ``bottom``; each value is an array of distinct packed
+      cubes, sorted by row
+
+    This collects the dimensions produced by :func:`_iter_face_closure`.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _face_closure(_encode_cubes([Cube([[0,1]])]))
+        {0: array([[1, 0],
+               [1, 2]]), 1: array([[1, 1]]), -1: array([], shape=(0, 2), dtype=int64)}
+    """
+    return dict(_iter_face_closure(codes, bottom))
+
+
+def _k_faces(codes, k):
+    """
+    The packed `k`-cells of the cubical complex with the given packed
+    maximal cubes, computed directly from them.
+
+    :param codes: array of cubes packed by :func:`_encode_cubes`
+    :param k: dimension
+    :return: array of the distinct packed `k`-cells, sorted by row
+
+    The `k`-faces of a `d`-cube are obtained by choosing `d-k` of its
+    nondegenerate intervals and collapsing each one to one of its
+    endpoints, for all the `d`-cubes of ``codes`` at once.  Unlike
+    :func:`_face_closure`, this computes no cells of the dimensions
+    between `k` and the top.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _k_faces(_encode_cubes([Cube([[0,1], [0,1]]), Cube([[1,2], [0]])]), 0)
+        array([[2, 0, 0],
+               [2, 0, 2],
+               [2, 2, 0],
+               [2, 2, 2],
+               [2, 4, 0]])
+    """
+    dims = _code_dimensions(codes)
+    faces = [codes[dims == k]]
+    # the empty cell is not a face of any cube
+    top = int(dims.max()) if len(dims) and k >= 0 else k
+    for d in range(k + 1, top + 1):
+        cubes = codes[dims == d]
+        if len(cubes) == 0:
+            continue
+        # the columns of the nondegenerate intervals of each cube, in
+        # order: each row has exactly d of them
+        columns = numpy.nonzero(cubes[:, 1:] & 1)[1].reshape(-1, d) + 1
+        which = numpy.arange(len(cubes))
+        for chosen in itertools.combinations(range(d), d - k):
+            for ends in itertools.product((-1, 1), repeat=d - k):
+                rows = cubes.copy()
+                for (slot, end) in zip(chosen, ends):
+                    rows[which, columns[:, slot]] += end
+                faces.append(rows)
+    return numpy.unique(numpy.concatenate(faces), axis=0)
+
+
+def _face_counts(codes):
+    """
+    The number of cells in each dimension of the cubical complex with
+    the given packed maximal cubes.
+
+    :param codes: array of cubes packed by :func:`_encode_cubes`
+    :return: list of the numbers of cells of dimensions 0, 1, ...,
+      up to the top dimension
+
+    This is :func:`_iter_face_closure` without keeping the cells: only
+    the cells of the current dimension are held, as a packed array.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> _face_counts(_encode_cubes([Cube([[0,1], [0,1]]), Cube([[1,2], [0]])]))
+        [5, 5, 1]
+    """
+    counts = [len(cells) for (dim, cells) in _iter_face_closure(codes, 0)]
+    return counts[::-1]
+
+
+def _boundary_entries(cells, faces):
+    """
+    The nonzero entries of the boundary matrix from ``cells`` to
+    ``faces``, as flat arrays.
+
+    :param cells: array of distinct packed cubes of some dimension `d`
+    :param faces: array of distinct packed cubes of dimension `d-1`,
+      with as many columns as ``cells``
+    :return: triple ``(rows, columns, signs)`` of integer arrays
+
+    The `k`-th nondegenerate interval of a cube gives it an upper face
+    with sign `(-1)^k` and a lower face with sign `-(-1)^k`; faces
+    which are not in ``faces`` (for instance because they lie in a
+    subcomplex) are left out.  All faces are looked up in ``faces`` at
+    once.
+
+    EXAMPLES::
+
+        >>> from sage.homology.cubical_complex import Cube
+        >>> square = _encode_cubes([Cube([[0,1], [0,1]])])
+        >>> edges = _face_closure(square)[1]
+        >>> _boundary_entries(square, edges)
+        (array([3, 0, 2, 1]), array([0, 0, 0, 0]), array([ 1, -1, -1,  1]))
+    """
+    intervals = cells[:, 1:] & 1
+    # number of nondegenerate intervals before each interval
+    before = numpy.cumsum(intervals, axis=1) - intervals
+    columns = []
+    signs = []
+    face_rows = [cells[:0]]
+    for j in range(1, cells.shape[1]):
+        which = numpy.flatnonzero(intervals[:, j-1])
+        if len(which) == 0:
+            continue
+        sign = 1 - 2 * (before[which, j-1] & 1)
+        for (delta, face_sign) in ((1, sign), (-1, -sign)):
+            rows = cells[which]
+            rows[:, j] += delta
+            face_rows.append(rows)
+            columns.append(which)
+            signs.append(face_sign)
+    if len(columns) == 0 or len(faces) == 0:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        return (empty, empty, empty)
+    rows = _row_index(faces, numpy.concatenate(face_rows))
+    present = rows >= 0
+    return (rows[present], numpy.concatenate(columns)[present],
+            numpy.concatenate(signs)[present])
+
+
+def _sage_matrix(mat, base_ring=ZZ):
+    """
+    Convert a SciPy sparse matrix to a sparse Sage matrix.
+
+    :param mat: a SciPy sparse matrix with integer entries
+    :param base_ring: the base ring of the result
+    :type base_ring: optional, default ZZ
+
+    EXAMPLES::
+
+        >>> import scipy.sparse
+        >>> _sage_matrix(scipy.sparse.csc_matrix([[0, 1], [-1, 0]]))
+        [ 0  1]
+        [-1  0]
+    """
+    coo = mat.tocoo()
+    entries = dict(zip(zip(coo.row.tolist(), coo.col.tolist()),
+                       coo.data.tolist()))
+    return matrix(base_ring, mat.shape[0], mat.shape[1], entries, sparse=True)
+
+
+def _subcomplex_key(subcomplex):
+    """
+    The key of ``subcomplex`` in the caches of a cubical complex:
+    ``None`` if it is ``None`` or empty, so that all the ways of
+    asking for absolute homology share one set of cells and boundary
+    matrices.
+
+    EXAMPLES::
+
+        >>> _subcomplex_key(CubicalComplex()) is None
+        True
+        >>> _subcomplex_key(cubical_complexes.Sphere(0))
+        Cubical complex with 2 vertices and 2 cubes
+    """
+    if subcomplex is None or subcomplex.dimension() < 0:
+        return None
+    return subcomplex
+
 
 @total_ordering
 class Cube(SageObject):
@@ -100,10 +593,15 @@ class Cube(SageObject):
       ``(i,i)`` or ``(i,)`` -- the last two are degenerate intervals.
     :return: an elementary cube
 
-    Each cube is stored in a standard form: a tuple of tuples, with a
-    nondegenerate interval ``[j,j]`` represented by ``(j,j)``, not
-    ``(j,)``.  (This is so that for any interval ``I``, ``I[1]`` will
-    produce a value, not an ``IndexError``.)
+    Each cube is stored compactly, since complexes can hold millions
+    of them: a tuple of the lower endpoints of its intervals, plus an
+    integer bitmask whose ``i``-th bit is set when the ``i``-th
+    interval is nondegenerate.  The hash value is cached the first
+    time it is computed.  The method :meth:`tuple` returns the
+    standard form: a tuple of tuples, with a degenerate interval
+    ``[j,j]`` represented by ``(j,j)``, not ``(j,)``.  (This is so
+    that for any interval ``I``, ``I[1]`` will produce a value, not an
+    ``IndexError``.)
 
     EXAMPLES::
 
@@ -121,6 +619,10 @@ class Cube(SageObject):
         >>> Cube(()).dimension()  # empty cube has dimension -1
         -1
     """
+    # lower corner, nondegeneracy bitmask, cached hash value, and
+    # memoized primary faces
+    __slots__ = ("_lower", "_mask", "_hash", "_faces")
+
     def __init__(self, data):
         """
         Define a cube for use in constructing a cubical complex.
@@ -134,29 +636,86 @@ class Cube(SageObject):
             [1,2] x [5,5] x [6,7] x [-1,0]
         """
         if isinstance(data, Cube):
-            data = tuple(data)
-        new_data = []
-        nondegenerate = []
-        i = 0
-        for x in data:
+            self._lower = data._lower
+            self._mask = data._mask
+            self._hash = data._hash
+            self._faces = None
+            return
+        lower = []
+        mask = 0
+        for i, x in enumerate(data):
+            if len(x) not in (1, 2):
+                raise ValueError("The interval %s is not of the correct form" % x)
+            try:
+                start = Integer(x[0])
+            except TypeError:
+                raise ValueError("The interval %s is not of the correct form" % x)
             if len(x) == 2:
-                try:
-                    Integer(x[0])
-                except TypeError:
-                    raise ValueError("The interval %s is not of the correct form" % x)
                 if x[0] + 1 == x[1]:
-                    nondegenerate.append(i)
+                    mask |= 1 << i
                 elif x[0] != x[1]:
                     raise ValueError("The interval %s is not of the correct form" % x)
-                new_data.append(tuple(x))
-            elif len(x) == 1:
-                y = tuple(x)
-                new_data.append(y+y)
-            elif len(x) != 1:
-                raise ValueError("The interval %s is not of the correct form" % x)
-            i += 1
-        self.__tuple = tuple(new_data)
-        self.__nondegenerate = nondegenerate
+            lower.append(int(start))
+        self._lower = tuple(lower)
+        self._mask = mask
+        self._hash = None
+        self._faces = None
+
+    @classmethod
+    def _from_corner(cls, lower, mask):
+        """
+        Build a cube directly from its internal representation,
+        without any of the checks done by ``__init__``.
+
+        :param lower: tuple of Python integers, the lower endpoints of
+          the intervals
+        :param mask: integer whose ``i``-th bit is set when the
+          ``i``-th interval is nondegenerate
+        :return: an elementary cube
+        :rtype: Cube
+
+        This is the fast path for code which already produces valid
+        intervals, such as the faces of an existing cube.
+
+        EXAMPLES::
+
+            >>> from sage.homology.cubical_complex import Cube
+            >>> Cube._from_corner((1, 5, 6, -1), 0b1101)
+            [1,2] x [5,5] x [6,7] x [-1,0]
+        """
+        cube = cls.__new__(cls)
+        cube._lower = lower
+        cube._mask = mask
+        cube._hash = None
+        cube._faces = None
+        return cube
+
+    @classmethod
+    def _from_corners(cls, lowers, masks):
+        """
+        Build many cubes at once, without validation.
+
+        :param lowers: two-dimensional array (or list of rows) of
+          integers; each row is the lower corner of a cube
+        :param masks: one-dimensional array (or list) of integers, the
+          nondegeneracy bitmasks of the cubes
+        :return: list of cubes, one for each row of ``lowers``
+
+        See :meth:`_from_corner`.
+
+        EXAMPLES::
+
+            >>> import numpy
+            >>> from sage.homology.cubical_complex import Cube
+            >>> Cube._from_corners(numpy.array([[0, 0], [0, 1]]), [1, 2])
+            [[0,1] x [0,0], [0,0] x [1,2]]
+        """
+        if hasattr(lowers, "tolist"):
+            lowers = lowers.tolist()
+        if hasattr(masks, "tolist"):
+            masks = masks.tolist()
+        make = cls._from_corner
+        return [make(tuple(lower), mask) for (lower, mask) in zip(lowers, masks)]
 
     def tuple(self):
         """
@@ -169,7 +728,9 @@ class Cube(SageObject):
             >>> C.tuple()
             ((1, 2), (5, 5), (6, 7), (-1, 0))
         """
-        return self.__tuple
+        mask = self._mask
+        return tuple((a, a + 1) if mask >> i & 1 else (a, a)
+                     for (i, a) in enumerate(self._lower))
 
     def is_face(self, other):
         """
@@ -187,18 +748,21 @@ class Cube(SageObject):
             >>> C2.is_face(C1)
             True
         """
-        def is_subinterval(i1, i2):
-            return ((i1[0] == i2[0] and i1[1] == i2[1]) or
-                    (i1[0] == i2[0] and i1[1] == i2[0]) or
-                    (i1[0] == i2[1] and i1[1] == i2[1]))
-
-        t = self.tuple()
-        u = other.tuple()
-        embed = len(u)
-        if len(t) == embed: # these must be equal for self to be a face of other
-            return all([is_subinterval(t[i], u[i]) for i in range(embed)])
-        else:
+        lower = self._lower
+        other_lower = other._lower
+        # these must be equal for self to be a face of other, and the
+        # nondegenerate intervals of self must be nondegenerate in other
+        if len(lower) != len(other_lower) or self._mask & ~other._mask:
             return False
+        if lower == other_lower:
+            return True
+        # where the corners differ, self must sit at the upper end of a
+        # nondegenerate interval of other
+        upper = other._mask & ~self._mask
+        for (i, (a, b)) in enumerate(zip(lower, other_lower)):
+            if a != b and (a != b + 1 or not upper >> i & 1):
+                return False
+        return True
 
     def _translate(self, vec):
         """
@@ -221,14 +785,12 @@ class Cube(SageObject):
             >>> C._translate((0, 0, 0, 0, 0, 5))
             [1,2] x [5,5] x [6,7] x [-1,0] x [0,0] x [5,5]
         """
-        t = self.__tuple
+        t = self._lower
         embed = max(len(t), len(vec))
-        t = t + ((0,0),) * (embed-len(t))
+        t = t + (0,) * (embed-len(t))
         vec = tuple(vec) + (0,) * (embed-len(vec))
-        new = []
-        for (a, b) in zip(t, vec):
-            new.append([a[0] + b, a[1] + b])
-        return Cube(new)
+        return Cube._from_corner(tuple([a + int(b) for (a, b) in zip(t, vec)]),
+                                 self._mask)
 
     def __getitem__(self, n):
         """
@@ -246,7 +808,12 @@ class Cube(SageObject):
             >>> C[1]
             (5, 5)
         """
-        return self.__tuple[n]
+        if isinstance(n, slice):
+            return self.tuple()[n]
+        a = self._lower[n]
+        if n < 0:
+            n += len(self._lower)
+        return (a, a + 1) if self._mask >> n & 1 else (a, a)
 
     def __iter__(self):
         """
@@ -259,7 +826,7 @@ class Cube(SageObject):
             >>> [x[0] for x in C]
             [1, 5, 6, -1]
         """
-        return iter(self.__tuple)
+        return iter(self.tuple())
 
     def __add__(self, other):
         """
@@ -284,7 +851,8 @@ class Cube(SageObject):
             >>> D + C * C
             [4,4] x [0,1] x [1,2] x [3,3] x [1,2] x [3,3]
         """
-        return Cube(self.__tuple + other.__tuple)
+        return Cube._from_corner(self._lower + other._lower,
+                                 self._mask | other._mask << len(self._lower))
 
     # the __add__ operation actually produces the product of the two cubes
     __mul__ = __add__
@@ -304,7 +872,8 @@ class Cube(SageObject):
             >>> C.nondegenerate_intervals()
             []
         """
-        return self.__nondegenerate
+        mask = self._mask
+        return [i for i in range(len(self._lower)) if mask >> i & 1]
 
     def dimension(self):
         """
@@ -322,9 +891,9 @@ class Cube(SageObject):
             >>> Cube([]).dimension()  # empty cube has dimension -1
             -1
         """
-        if len(self.__tuple) == 0:  # empty cube
+        if len(self._lower) == 0:  # empty cube
             return -1
-        return len(self.nondegenerate_intervals())
+        return bin(self._mask).count("1")
 
     def face(self, n, upper=True):
         """
@@ -359,31 +928,84 @@ class Cube(SageObject):
         if n < 0 or n >= self.dimension():
             raise ValueError("Can only compute the nth face if 0 <= n < dim.")
         idx = self.nondegenerate_intervals()[n]
-        t = self.__tuple
+        lower = self._lower
         if upper:
-            new = t[idx][1]
-        else:
-            new = t[idx][0]
-        return Cube(t[0:idx] + ((new,new),) + t[idx+1:])
+            lower = lower[0:idx] + (lower[idx] + 1,) + lower[idx+1:]
+        return Cube._from_corner(lower, self._mask & ~(1 << idx))
+
+    def _primary_faces(self):
+        """
+        The tuple of faces (of codimension 1) of this cube: first the
+        upper faces, then the lower ones.
+
+        This is computed once and then memoized on the cube, subject to
+        :func:`set_face_cache_size`.
+
+        EXAMPLES::
+
+            >>> from sage.homology.cubical_complex import Cube
+            >>> C = Cube([[1,2], [3,4]])
+            >>> C._primary_faces() is C._primary_faces()
+            True
+        """
+        faces = self._faces
+        if faces is not None:
+            return faces
+        faces = self._uncached_faces()
+        if _face_cache_size != 0:
+            self._faces = faces
+            if _face_cache_size is not None:
+                _face_cache_queue.append(self)
+                while len(_face_cache_queue) > _face_cache_size:
+                    _face_cache_queue.popleft()._faces = None
+        return faces
+
+    def _uncached_faces(self):
+        """
+        The tuple of faces (of codimension 1) of this cube, as in
+        :meth:`_primary_faces`, computed without reading or filling
+        the memo.
+
+        EXAMPLES::
+
+            >>> from sage.homology.cubical_complex import Cube
+            >>> C = Cube([[1,2], [3,4]])
+            >>> C._uncached_faces() == C.faces()
+            True
+            >>> C._uncached_faces() is C._uncached_faces()
+            False
+        """
+        lower = self._lower
+        mask = self._mask
+        upper_faces = []
+        lower_faces = []
+        for idx in range(len(lower)):
+            if mask >> idx & 1:
+                face_mask = mask & ~(1 << idx)
+                upper_faces.append(Cube._from_corner(
+                    lower[0:idx] + (lower[idx] + 1,) + lower[idx+1:], face_mask))
+                lower_faces.append(Cube._from_corner(lower, face_mask))
+        return tuple(upper_faces + lower_faces)
 
     def faces(self):
         """
-        The list of faces (of codimension 1) of this cube.
+        The tuple of faces (of codimension 1) of this cube.
+
+        The tuple is computed on the first call and shared by later
+        ones; see :func:`set_face_cache_size`.
 
         EXAMPLES::
 
             >>> from sage.homology.cubical_complex import Cube
             >>> C = Cube([[1,2], [3,4]])
             >>> C.faces()
-            [[2,2] x [3,4], [1,2] x [4,4], [1,1] x [3,4], [1,2] x [3,3]]
+            ([2,2] x [3,4], [1,2] x [4,4], [1,1] x [3,4], [1,2] x [3,3])
         """
-        upper = [self.face(i,True) for i in range(self.dimension())]
-        lower = [self.face(i,False) for i in range(self.dimension())]
-        return upper + lower
+        return self._primary_faces()
 
     def faces_as_pairs(self):
         """
-        The list of faces (of codimension 1) of this cube, as pairs
+        The tuple of faces (of codimension 1) of this cube, as pairs
         (upper, lower).
 
         EXAMPLES::
@@ -391,11 +1013,11 @@ class Cube(SageObject):
             >>> from sage.homology.cubical_complex import Cube
             >>> C = Cube([[1,2], [3,4]])
             >>> C.faces_as_pairs()
-            [([2,2] x [3,4], [1,1] x [3,4]), ([1,2] x [4,4], [1,2] x [3,3])]
+            (([2,2] x [3,4], [1,1] x [3,4]), ([1,2] x [4,4], [1,2] x [3,3]))
         """
-        upper = [self.face(i, True) for i in range(self.dimension())]
-        lower = [self.face(i, False) for i in range(self.dimension())]
-        return list(zip(upper, lower))
+        faces = self._primary_faces()
+        d = len(faces) // 2
+        return tuple(zip(faces[:d], faces[d:]))
 
     def _compare_for_gluing(self, other):
         r"""
@@ -585,6 +1207,7 @@ class Cube(SageObject):
         """
         from sage.sets.set import Set
         N = Set(self.nondegenerate_intervals())
+        lower = self._lower
         result = []
         for J in N.subsets(dim):
             Jprime = N.difference(J)
@@ -593,20 +1216,17 @@ class Cube(SageObject):
                 for j in Jprime:
                     if j<i:
                         nu += 1
-            t = self.tuple()
-            left = []
-            right = []
-            for j in range(len(t)):
-                if j in Jprime:
-                    left.append((t[j][0], t[j][0]))
-                    right.append(t[j])
-                elif j in J:
-                    left.append(t[j])
-                    right.append((t[j][1], t[j][1]))
-                else:
-                    left.append(t[j])
-                    right.append(t[j])
-            result.append(((-1)**nu, Cube(left), Cube(right)))
+            # the intervals in Jprime collapse to their lower endpoint
+            # on the left, those in J to their upper endpoint on the
+            # right.
+            J_mask = 0
+            for j in J:
+                J_mask |= 1 << j
+            left = Cube._from_corner(lower, J_mask)
+            right = Cube._from_corner(
+                tuple([a + (J_mask >> j & 1) for (j, a) in enumerate(lower)]),
+                self._mask & ~J_mask)
+            result.append(((-1)**nu, left, right))
         return result
 
     def __eq__(self, other):
@@ -628,6 +1248,9 @@ class Cube(SageObject):
             >>> C1 == C3  # indirect doctest
             False
         """
+        if isinstance(other, Cube):
+            return (self._mask == other._mask and
+                    self._lower == other._lower)
         return tuple(self) == tuple(other)
 
     def __ne__(self, other):
@@ -699,7 +1322,24 @@ class Cube(SageObject):
             >>> C1.__hash__()
             837272820736660832
         """
-        return hash(self.__tuple)
+        if self._hash is None:
+            self._hash = hash(self.tuple())
+        return self._hash
+
+    def __reduce__(self):
+        """
+        Pickling support, needed since ``__slots__`` leaves no
+        ``__dict__`` to pickle.
+
+        EXAMPLES::
+
+            >>> import pickle
+            >>> from sage.homology.cubical_complex import Cube
+            >>> C1 = Cube([[1,1], [2,3], [4,5]])
+            >>> pickle.loads(pickle.dumps(C1)) == C1
+            True
+        """
+        return (Cube, (self.tuple(),))
 
     def _repr_(self):
         """
@@ -714,7 +1354,7 @@ class Cube(SageObject):
             >>> C1._repr_()
             '[1,1] x [2,3] x [4,5]'
         """
-        s = ["[%s,%s]"%(str(x), str(y)) for (x,y) in self.__tuple]
+        s = ["[%s,%s]"%(str(x), str(y)) for (x,y) in self.tuple()]
         return " x ".join(s)
 
     def _latex_(self):
@@ -830,7 +1470,9 @@ class CubicalComplex(GenericCellComplex):
         if C is not None:
             self._facets = copy(C._facets)
             self._cells = copy(C._cells)
+            self._codes = copy(C._codes)
             self._complex = copy(C._complex)
+            self._digest = C._digest
             return
 
         cubes = [Cube(f) for f in maximal_faces]
@@ -847,35 +1489,69 @@ class CubicalComplex(GenericCellComplex):
         # dictionary keyed by dimension.  This should be empty until
         # needed -- that is, until the faces method is called
         self._cells = {}
-        # self._complex: dictionary indexed by dimension d, base_ring,
-        # etc.: differential from dim d to dim d-1 in the associated
-        # chain complex.  thus to get the differential in the cochain
-        # complex from dim d-1 to dim d, take the transpose of this
-        # one.
+        # self._codes: the same cells as self._cells, packed into
+        # arrays by _encode_cubes and keyed by dimension, for the
+        # dimensions computed so far; see _cell_codes
+        self._codes = {}
+        # self._complex: dictionary indexed by dimension d and
+        # subcomplex: differential from dim d to dim d-1 in the
+        # associated chain complex, as a SciPy sparse integer matrix.
+        # thus to get the differential in the cochain complex from dim
+        # d-1 to dim d, take the transpose of this one.
         self._complex = {}
+        # self._digest: fingerprint of the set of facets, used as a
+        # key by the on-disk cache of boundary matrices; see _fingerprint
+        self._digest = None
 
     @staticmethod
     def maximal_cubes(cubes):
         """ Remove cubes that are faces of other cubes in this list
 
+        The cubes are handled by decreasing dimension: a cube is
+        maximal iff it is not a face of a maximal cube of higher
+        dimension, which is a lookup in the set of all faces of those
+        cubes in its dimension.  That set is built one dimension at a
+        time from the primary faces of the dimension above, so the
+        cost is roughly linear in the total number of faces.  The
+        faces are computed without memoization, so that none of them
+        outlive this call.
+
+        Duplicates are removed, and the maximal cubes are returned in
+        the order of their last occurrence in ``cubes``.
+
         EXAMPLES::
 
-            TODO
-        """
+            >>> from sage.homology.cubical_complex import Cube
+            >>> CubicalComplex.maximal_cubes([Cube([[0,0], [0,1]]), Cube([[0,1], [0,1]]), Cube([[5,5], [5,5]])])
+            [[0,1] x [0,1], [5,5] x [5,5]]
+        """
+        last_index = {}
+        for (i, cube) in enumerate(cubes):
+            last_index[cube] = i
+        if not last_index:
+            return []
+        by_dimension = {}
+        for cube in last_index:
+            by_dimension.setdefault(cube.dimension(), []).append(cube)
+        top = max(by_dimension)
+        bottom = min(by_dimension)
+
         maximal_cubes = []
-        for cube in cubes:
-            # check whether each given cube is actually maximal
-            cube_is_maximal = True
-            cubes_to_be_removed = []
-            for other in maximal_cubes:
-                if other.is_face(cube):
-                    cubes_to_be_removed.append(other)
-                elif cube_is_maximal:
-                    cube_is_maximal = not cube.is_face(other)
-            for x in cubes_to_be_removed:
-                maximal_cubes.remove(x)
-            if cube_is_maximal:
-                maximal_cubes += [cube]
+        # covered: all faces of the maximal cubes found so far, in the
+        # current dimension
+        covered = set()
+        for dim in range(top, bottom - 1, -1):
+            new = [cube for cube in by_dimension.get(dim, [])
+                   if cube not in covered]
+            maximal_cubes.extend(new)
+            if dim > bottom:
+                faces = set()
+                for cube in new:
+                    faces.update(cube._uncached_faces())
+                for cube in covered:
+                    faces.update(cube._uncached_faces())
+                covered = faces
+        maximal_cubes.sort(key=last_index.__getitem__)
         return maximal_cubes
 
     def maximal_cells(self):
@@ -966,7 +1642,10 @@ class CubicalComplex(GenericCellComplex):
         :param other: a cubical complex
 
         Each maximal cube of ``self`` must be a face of a maximal cube
-        of ``other`` for this to be True.
+        of ``other`` for this to be True.  This is checked against the
+        packed cells of ``other`` (see :meth:`_cell_codes`), which are
+        cached, so repeated tests against the same complex are cheap,
+        and no cell of ``other`` is turned into a ``Cube``.
 
         EXAMPLES::
 
@@ -999,12 +1678,33 @@ class CubicalComplex(GenericCellComplex):
             >>> C1.product(C0).maximal_cells()
             {[0,1] x [0,0]}
         """
-        other_facets = other.maximal_cells()
-        answer = True
-        for cube in self.maximal_cells():
-            answer = answer and any([cube.is_face(other_cube)
-                                     for other_cube in other_facets])
-        return answer
+        # the empty cube is only recorded as a facet
+        if any(cube not in other._facets for cube in self._facets
+               if cube.dimension() < 0):
+            return False
+        facets = [cube for cube in self._facets if cube.dimension() >= 0]
+        if not facets:
+            return True
+        try:
+            codes = _encode_cubes(facets)
+            dims = _code_dimensions(codes)
+            index = other._cell_codes(dims=set(dims.tolist()))
+        except OverflowError:
+            cells = other.cells()
+            return all(cube in cells.get(cube.dimension(), ())
+                       for cube in facets)
+        # the cells of ``other`` are computed once per dimension and
+        # cached, so this is one batch of row lookups per dimension
+        for dim in set(dims.tolist()):
+            table = index.get(dim)
+            if table is None or len(table) == 0:
+                return False
+            rows = codes[dims == dim]
+            width = max(rows.shape[1], table.shape[1])
+            if (_row_index(_pad_codes(table, width),
+                           _pad_codes(rows, width)) < 0).any():
+                return False
+        return True
 
     def cells(self, subcomplex=None):
         """
@@ -1031,41 +1731,362 @@ class CubicalComplex(GenericCellComplex):
              [0,1] x [1,1] x [0,1],
              [1,1] x [0,1] x [0,1]]
         """
+        subcomplex = _subcomplex_key(subcomplex)
         if subcomplex not in self._cells:
-            if subcomplex is not None and subcomplex.dimension() > -1:
+            try:
+                codes = self._cell_codes(subcomplex)
+            except OverflowError:
+                self._cells[subcomplex] = self._cells_by_faces(subcomplex)
+            else:
+                self._cells[subcomplex] = dict(
+                    (dim, set(_decode_cubes(rows)))
+                    for (dim, rows) in codes.items())
+        return self._cells[subcomplex]
+
+    def _cell_codes(self, subcomplex=None, dims=None):
+        """
+        The cells of this cubical complex which are not in
+        ``subcomplex``, packed by :func:`_encode_cubes`.
+
+        :param subcomplex: a subcomplex of this cubical complex
+        :type subcomplex: a cubical complex; optional, default None
+        :param dims: the dimensions to compute
+        :type dims: iterable of integers; optional, default all of
+          them, from -1 to the dimension of this complex
+        :return: dictionary keyed by the dimensions in ``dims`` which
+          are between -1 and the dimension of this complex; each value
+          is an array of distinct packed cubes, sorted by row
+
+        This is the closure engine behind :meth:`cells`; the rows are
+        only turned into cubes when :meth:`cells` is called.  Each
+        dimension is computed once and cached.  When the dimensions
+        missing from the cache go down from the top without gaps, they
+        are computed by :func:`_face_closure`; otherwise, each one is
+        computed directly from the facets by :func:`_k_faces`, so
+        that no cells of the dimensions in between are computed.
+        Raise ``OverflowError`` if the coordinates are too large to
+        pack.
+
+        EXAMPLES::
+
+            >>> C1 = cubical_complexes.Cube(1)
+            >>> S0 = cubical_complexes.Sphere(0)
+            >>> C1._cell_codes(S0)
+            {0: array([], shape=(0, 2), dtype=int64), 1: array([[1, 1]]), -1: array([], shape=(0, 2), dtype=int64)}
+        """
+        top = self.dimension()
+        if dims is None:
+            dims = range(-1, top+1)
+        dims = sorted(set(dim for dim in dims if -1 <= dim <= top),
+                      reverse=True)
+        subcomplex = _subcomplex_key(subcomplex)
+        if subcomplex not in self._codes:
+            if subcomplex is not None:
                 if not subcomplex.is_subcomplex(self):
                     raise ValueError("The 'subcomplex' is not actually a subcomplex.")
-            # Cells is the dictionary of cells in self but not in
-            # subcomplex, indexed by dimension
-            Cells = {}
-            # sub_facets is the dictionary of facets in the subcomplex
-            sub_facets = {}
-            dimension = max([cube.dimension() for cube in self._facets])
-            # initialize the lists: add each maximal cube to Cells and sub_facets
-            for i in range(-1,dimension+1):
-                Cells[i] = set([])
-                sub_facets[i] = set([])
-            for f in self._facets:
-                Cells[f.dimension()].add(f)
+            self._codes[subcomplex] = {}
+        # the cache holds the cells of the dimensions computed so far
+        cache = self._codes[subcomplex]
+        missing = [dim for dim in dims if dim not in cache]
+        if missing:
+            facets = _encode_cubes(self._facets)
+            if missing == list(range(top, missing[-1]-1, -1)):
+                codes = _face_closure(facets, missing[-1])
+            else:
+                codes = dict((dim, _k_faces(facets, dim)) for dim in missing)
             if subcomplex is not None:
-                for g in subcomplex._facets:
-                    dim = g.dimension()
-                    Cells[dim].discard(g)
-                    sub_facets[dim].add(g)
-            # bad_faces is the set of faces in the subcomplex in the
-            # current dimension
-            bad_faces = sub_facets[dimension]
-            for dim in range(dimension, -1, -1):
-                # bad_bdries = boundaries of bad_faces: things to be
-                # discarded in dim-1
-                bad_bdries = sub_facets[dim-1]
-                for f in bad_faces:
-                    bad_bdries.update(f.faces())
-                for f in Cells[dim]:
-                    Cells[dim-1].update(set(f.faces()).difference(bad_bdries))
-                bad_faces = bad_bdries
-            self._cells[subcomplex] = Cells
-        return self._cells[subcomplex]
+                sub_codes = subcomplex._cell_codes(dims=missing)
+                for (dim, rows) in codes.items():
+                    sub_rows = sub_codes.get(dim)
+                    if sub_rows is None or len(sub_rows) == 0 or len(rows) == 0:
+                        continue
+                    width = max(rows.shape[1], sub_rows.shape[1])
+                    outside = _row_index(_pad_codes(sub_rows, width),
+                                         _pad_codes(rows, width)) < 0
+                    codes[dim] = rows[outside]
+            cache.update(codes)
+        return dict((dim, cache[dim]) for dim in dims)
+
+    def _cells_by_faces(self, subcomplex=None):
+        """
+        The cells of this cubical complex which are not in
+        ``subcomplex``, computed one cube at a time.
+
+        This is used by :meth:`cells` for cubes whose coordinates are
+        too large for :meth:`_cell_codes`.
+
+        EXAMPLES::
+
+            >>> S2 = cubical_complexes.Sphere(2)
+            >>> S2._cells_by_faces() == S2.cells()
+            True
+        """
+        if subcomplex is not None and subcomplex.dimension() > -1:
+            if not subcomplex.is_subcomplex(self):
+                raise ValueError("The 'subcomplex' is not actually a subcomplex.")
+        # Cells is the dictionary of cells in self but not in
+        # subcomplex, indexed by dimension
+        Cells = {}
+        # sub_facets is the dictionary of facets in the subcomplex
+        sub_facets = {}
+        dimension = max([cube.dimension() for cube in self._facets])
+        # initialize the lists: add each maximal cube to Cells and sub_facets
+        for i in range(-1,dimension+1):
+            Cells[i] = set([])
+            sub_facets[i] = set([])
+        for f in self._facets:
+            Cells[f.dimension()].add(f)
+        if subcomplex is not None:
+            for g in subcomplex._facets:
+                dim = g.dimension()
+                Cells[dim].discard(g)
+                sub_facets[dim].add(g)
+        # bad_faces is the set of faces in the subcomplex in the
+        # current dimension
+        bad_faces = sub_facets[dimension]
+        for dim in range(dimension, -1, -1):
+            # bad_bdries = boundaries of bad_faces: things to be
+            # discarded in dim-1
+            bad_bdries = sub_facets[dim-1]
+            for f in bad_faces:
+                bad_bdries.update(f.faces())
+            for f in Cells[dim]:
+                Cells[dim-1].update(set(f.faces()).difference(bad_bdries))
+            bad_faces = bad_bdries
+        return Cells
+
+    def n_cells(self, n, subcomplex=None):
+        """
+        List of cells of dimension ``n`` of this cubical complex.
+        If the optional argument ``subcomplex`` is present, then
+        return the ``n``-dimensional cells which are *not* in the
+        subcomplex.
+
+        :param n: dimension
+        :type n: integer
+        :param subcomplex: a subcomplex of this cubical complex
+        :type subcomplex: a cubical complex; optional, default None
+        :return: sorted list of cells in dimension ``n``
+
+        The cells are sorted, which is also the order of the bases
+        used by :meth:`chain_complex`.
+
+        EXAMPLES::
+
+            >>> C = cubical_complexes.Cube(2)
+            >>> C.n_cells(1)
+            [[0,0] x [0,1], [0,1] x [0,0], [0,1] x [1,1], [1,1] x [0,1]]
+        """
+        try:
+            codes = self._cell_codes(subcomplex, dims=[n])
+        except OverflowError:
+            return sorted(self.cells(subcomplex).get(n, ()))
+        if n not in codes:
+            return []
+        return _decode_cubes(codes[n])
+
+    def _n_cells_count(self, n, subcomplex=None):
+        """
+        The number of cells of dimension ``n`` of this cubical complex
+        which are not in ``subcomplex``.
+
+        EXAMPLES::
+
+            >>> cubical_complexes.Cube(2)._n_cells_count(1)
+            4
+        """
+        # a known boundary matrix into or out of dimension n has the
+        # answer as one of its dimensions
+        for (dim, axis) in ((n, 1), (n+1, 0)):
+            if dim > 0:
+                mat = self._cached_boundary_matrix(dim, subcomplex)
+                if mat is not None:
+                    return mat.shape[axis]
+        try:
+            codes = self._cell_codes(subcomplex, dims=[n])
+        except OverflowError:
+            return len(self.cells(subcomplex).get(n, ()))
+        return len(codes.get(n, ()))
+
+    def f_vector(self):
+        """
+        The `f`-vector of this cubical complex: the list whose `i`-th
+        entry is the number of cells of dimension `i-1`, starting with
+        a 1 for the empty cell.
+
+        The cells are counted one dimension at a time, without building
+        :meth:`cells`, so this takes much less memory.
+
+        EXAMPLES::
+
+            >>> cubical_complexes.Sphere(2).f_vector()
+            [1, 8, 12, 6]
+        """
+        codes = self._codes.get(None, {})
+        dims = range(self.dimension()+1)
+        if all(dim in codes for dim in dims):
+            return [1] + [len(codes[dim]) for dim in dims]
+        try:
+            counts = _face_counts(_encode_cubes(self._facets))
+        except OverflowError:
+            cells = self.cells()
+            counts = [len(cells[dim]) for dim in range(self.dimension()+1)]
+        return [1] + counts
+
+    def euler_characteristic(self):
+        """
+        The Euler characteristic of this cubical complex: the
+        alternating sum of the numbers of cells in each dimension,
+        from :meth:`f_vector`.
+
+        EXAMPLES::
+
+            >>> cubical_complexes.Sphere(2).euler_characteristic()
+            2
+            >>> cubical_complexes.SurfaceOfGenus(2).euler_characteristic()
+            -2
+        """
+        return sum((-1)**dim * count
+                   for (dim, count) in enumerate(self.f_vector()[1:]))
+
+    def _fingerprint(self):
+        """
+        A fingerprint of the set of maximal cells of this complex, as
+        a string of hexadecimal digits.
+
+        Complexes with the same maximal cells, listed in any order,
+        have the same fingerprint.
+
+        EXAMPLES::
+
+            >>> C = CubicalComplex([([0,1], [0]), ([0], [0,1])])
+            >>> D = CubicalComplex([([0], [0,1]), ([0,1], [0])])
+            >>> C._fingerprint() == D._fingerprint()
+            True
+        """
+        if self._digest is None:
+            digest = hashlib.sha1(b"cubical complex 1\n")
+            try:
+                codes = numpy.unique(_encode_cubes(self._facets), axis=0)
+            except OverflowError:
+                for cube in sorted(self._facets):
+                    digest.update(repr(cube.tuple()).encode("ascii") + b"\n")
+            else:
+                digest.update(repr(codes.shape).encode("ascii"))
+                digest.update(numpy.ascontiguousarray(codes, "<i8").tobytes())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def _cached_boundary_matrix(self, dim, subcomplex=None):
+        """
+        The boundary matrix from dimension ``dim``, if it is already
+        known: from the memory cache or from the on-disk cache (see
+        :func:`set_boundary_cache_dir`).  Otherwise return ``None``.
+        """
+        subcomplex = _subcomplex_key(subcomplex)
+        mat = self._complex.get((dim, subcomplex))
+        if mat is None and _boundary_cache_dir is not None:
+            mat = _load_boundary(self._boundary_cache_path(subcomplex), dim)
+            if mat is not None:
+                self._complex[(dim, subcomplex)] = mat
+        return mat
+
+    def _boundary_cache_path(self, subcomplex=None):
+        """
+        The directory holding the boundary matrices of this complex,
+        relative to ``subcomplex``, in the on-disk cache.
+        """
+        name = self._fingerprint()
+        if _subcomplex_key(subcomplex) is not None:
+            name += "-" + subcomplex._fingerprint()
+        return os.path.join(_boundary_cache_dir, name)
+
+    def _boundary_matrix(self, dim, subcomplex=None, codes=None):
+        """
+        The boundary map from dimension ``dim`` to ``dim-1``, relative
+        to ``subcomplex``, as a SciPy sparse matrix over the integers.
+
+        :param dim: dimension
+        :type dim: positive integer
+        :param subcomplex: a subcomplex of this cubical complex
+        :type subcomplex: a cubical complex; optional, default None
+        :param codes: the packed cells relative to ``subcomplex`` of
+          dimensions ``dim`` and ``dim-1``, keyed by dimension as
+          :meth:`_cell_codes` returns them, if the caller already has
+          them
+        :type codes: dictionary; optional, default None
+        :return: ``scipy.sparse.csc_matrix`` with one column for each
+          cell of dimension ``dim`` and one row for each cell of
+          dimension ``dim-1``, in the order of :meth:`n_cells`
+
+        The row indices, column indices and signs are computed as flat
+        arrays from the packed cells by :func:`_boundary_entries`.  The
+        result is cached, and also stored on disk if
+        :func:`set_boundary_cache_dir` was called; :meth:`chain_complex`
+        converts it to a Sage matrix.
+
+        EXAMPLES::
+
+            >>> S1 = cubical_complexes.Sphere(1)
+            >>> S1._boundary_matrix(1).toarray()
+            array([[-1, -1,  0,  0],
+                   [ 1,  0, -1,  0],
+                   [ 0,  1,  0, -1],
+                   [ 0,  0,  1,  1]], dtype=int8)
+        """
+        subcomplex = _subcomplex_key(subcomplex)
+        if self._cached_boundary_matrix(dim, subcomplex) is None:
+            try:
+                if codes is None:
+                    codes = self._cell_codes(subcomplex, dims=[dim, dim-1])
+            except OverflowError:
+                entries = self._boundary_entries_by_faces(dim, subcomplex)
+                shape = (self._n_cells_count(dim-1, subcomplex),
+                         self._n_cells_count(dim, subcomplex))
+            else:
+                empty = numpy.zeros((0, 1), dtype=numpy.int64)
+                cells = codes.get(dim, empty)
+                faces = codes.get(dim-1, empty)
+                entries = _boundary_entries(cells, faces)
+                shape = (len(faces), len(cells))
+            (rows, columns, signs) = entries
+            mat = scipy.sparse.csc_matrix(
+                (numpy.asarray(signs, dtype=numpy.int8), (rows, columns)),
+                shape=shape)
+            self._complex[(dim, subcomplex)] = mat
+            if _boundary_cache_dir is not None:
+                _save_boundary(self._boundary_cache_path(subcomplex), dim, mat)
+        return self._complex[(dim, subcomplex)]
+
+    def _boundary_entries_by_faces(self, dim, subcomplex=None):
+        """
+        The nonzero entries of :meth:`_boundary_matrix`, computed one
+        cube at a time.
+
+        This is used for cubes whose coordinates are too large for
+        :meth:`_cell_codes`.
+
+        EXAMPLES::
+
+            >>> S1 = cubical_complexes.Sphere(1)
+            >>> S1._boundary_entries_by_faces(1)
+            ([1, 0, 2, 0, 3, 1, 3, 2], [0, 0, 1, 1, 2, 2, 3, 3], [1, -1, 1, -1, 1, -1, 1, -1])
+        """
+        index = dict((cube, i) for (i, cube)
+                     in enumerate(self.n_cells(dim-1, subcomplex)))
+        rows = []
+        columns = []
+        signs = []
+        for (col, cube) in enumerate(self.n_cells(dim, subcomplex)):
+            sign = 1
+            for (upper, lower) in cube.faces_as_pairs():
+                for (face, face_sign) in ((upper, sign), (lower, -sign)):
+                    if face in index:
+                        rows.append(index[face])
+                        columns.append(col)
+                        signs.append(face_sign)
+                sign = -sign
+        return (rows, columns, signs)
 
     def n_cubes(self, n, subcomplex=None):
         """
@@ -1106,8 +2127,8 @@ class CubicalComplex(GenericCellComplex):
         :param dimensions: if None, compute the chain complex in all
            dimensions.  If a list or tuple of integers, compute the
            chain complex in those dimensions, setting the chain groups
-           in all other dimensions to zero.  NOT IMPLEMENTED YET: this
-           function always returns the entire chain complex
+           in all other dimensions to zero.  Only the cells and
+           boundary matrices needed for those dimensions are computed.
         :param base_ring: commutative ring
         :type base_ring: optional, default ZZ
         :param subcomplex: a subcomplex of this cubical complex.
@@ -1115,8 +2136,8 @@ class CubicalComplex(GenericCellComplex):
         :type subcomplex: optional, default empty
         :param augmented: If True, return the augmented chain complex
            (that is, include a class in dimension `-1` corresponding
-           to the empty cell).  This is ignored if ``dimensions`` is
-           specified.
+           to the empty cell).  If ``dimensions`` is specified, this
+           only has an effect if it contains `-1` and `0`.
         :type augmented: boolean; optional, default False
         :param cochain: If True, return the cochain complex (that is,
            the dual of the chain complex).
@@ -1152,74 +2173,73 @@ class CubicalComplex(GenericCellComplex):
             Chain complex with at most 1 nonzero terms over Integer Ring
             >>> C1.homology(subcomplex=S0)
             {0: 0, 1: Z}
+
+        Only computing some dimensions::
+
+            >>> S2.chain_complex(dimensions=[1, 2])
+            Chain complex with at most 2 nonzero terms over Integer Ring
+            >>> Prod.homology(1)
+            0
         """
         # initialize subcomplex
-        if subcomplex is None:
-            subcomplex = CubicalComplex()
-        else:
-            # subcomplex is not empty, so don't augment the chain complex
+        if subcomplex is not None:
+            # subcomplex is given, so don't augment the chain complex
             augmented = False
+        # the empty subcomplex shares the caches of None
+        subcomplex = _subcomplex_key(subcomplex)
         differentials = {}
         if augmented:
             empty_cell = 1  # number of (-1)-dimensional cubes
         else:
             empty_cell = 0
-        vertices = self.n_cells(0, subcomplex=subcomplex)
-        n = len(vertices)
-        mat = matrix(base_ring, empty_cell, n, n*empty_cell*[1])
-        if cochain:
-            differentials[-1] = mat.transpose()
-        else:
-            differentials[0] = mat
-        current = vertices
-        # now loop from 1 to dimension of the complex
-        for dim in range(1,self.dimension()+1):
-            if verbose:
-                print("  starting dimension %s" % dim)
-            if (dim, subcomplex) in self._complex:
-                if cochain:
-                    differentials[dim-1] = self._complex[(dim, subcomplex)].transpose().change_ring(base_ring)
-                    mat = differentials[dim-1]
-                else:
-                    differentials[dim] = self._complex[(dim, subcomplex)].change_ring(base_ring)
-                    mat = differentials[dim]
-                if verbose:
-                    print("    boundary matrix (cached): it's %s by %s." % (mat.nrows(), mat.ncols()))
+        if dimensions is None:
+            dimensions = range(-1, self.dimension()+1)
+        dimensions = sorted(set(dimensions))
+        # if the top dimension is requested, the cells of all the
+        # requested dimensions are computed at once, going down from the
+        # top by _face_closure, rather than one dimension at a time by
+        # _k_faces, unless the differentials are all cached already
+        top = self.dimension()
+        codes = None
+        if top in dimensions and any(
+                dim-1 in dimensions and
+                self._cached_boundary_matrix(dim, subcomplex) is None
+                for dim in dimensions if dim > 0):
+            try:
+                codes = self._cell_codes(
+                    subcomplex, dims=range(max(dimensions[0], 0), top+1))
+            except OverflowError:
+                pass
+        # loop over the requested dimensions: the differential from
+        # dimension dim is only computed if dim-1 is also requested,
+        # otherwise it maps to the zero group.
+        for dim in dimensions:
+            if dim < 0:
+                continue
+            if dim-1 not in dimensions:
+                n = self._n_cells_count(dim, subcomplex=subcomplex)
+                mat = matrix(base_ring, 0, n)
+            elif dim == 0:
+                n = self._n_cells_count(0, subcomplex=subcomplex)
+                mat = matrix(base_ring, empty_cell, n, n*empty_cell*[1])
             else:
-                # 'current' is the list of cells in dimension n
-                #
-                # 'old' is a dictionary, with keys the cells in the
-                # previous dimension, values the integers 0, 1, 2,
-                # ... (the index of the face).  finding an entry in a
-                # dictionary seems to be faster than finding the index
-                # of an entry in a list.
-                old = dict(zip(current, range(len(current))))
-                current = list(self.n_cells(dim, subcomplex=subcomplex))
-                # construct matrix.  it is easiest to construct it as
-                # a sparse matrix, specifying which entries are
-                # nonzero via a dictionary.
-                matrix_data = {}
-                col = 0
-                if len(old) and len(current):
-                    for cube in current:
-                        faces = cube.faces_as_pairs()
-                        sign = 1
-                        for (upper, lower) in faces:
-                            try:
-                                matrix_data[(old[upper], col)] = sign
-                                sign *= -1
-                                matrix_data[(old[lower], col)] = sign
-                            except KeyError:
-                                pass
-                        col += 1
-                mat = matrix(ZZ, len(old), len(current), matrix_data)
-                self._complex[(dim, subcomplex)] = mat
-                if cochain:
-                    differentials[dim-1] = mat.transpose().change_ring(base_ring)
-                else:
-                    differentials[dim] = mat.change_ring(base_ring)
                 if verbose:
-                    print("    boundary matrix computed: it's %s by %s." % (mat.nrows(), mat.ncols()))
+                    print("  starting dimension %s" % dim)
+                cached = (dim, subcomplex) in self._complex
+                # the boundary matrix is assembled as a SciPy sparse
+                # matrix and only converted to a Sage matrix here
+                mat = _sage_matrix(self._boundary_matrix(dim, subcomplex,
+                                                         codes),
+                                   base_ring)
+                if verbose:
+                    if cached:
+                        print("    boundary matrix (cached): it's %s by %s." % (mat.nrows(), mat.ncols()))
+                    else:
+                        print("    boundary matrix computed: it's %s by %s." % (mat.nrows(), mat.ncols()))
+            if cochain:
+                differentials[dim-1] = mat.transpose()
+            else:
+                differentials[dim] = mat
         # finally, return the chain complex
         if cochain:
             return ChainComplex(data=differentials, base_ring=base_ring,
@@ -1228,6 +2248,231 @@ class CubicalComplex(GenericCellComplex):
             return ChainComplex(data=differentials, base_ring=base_ring,
                                 degree=-1, check=check)
 
+    def homology(self, dim=None, **kwds):
+        r"""
+        The (reduced) homology of this cubical complex.
+
+        :param dim: If None, then return the homology in every
+           dimension.  If ``dim`` is an integer or list, return the
+           homology in the given dimensions.
+        :param algorithm: in addition to the algorithms of
+           :meth:`GenericCellComplex.homology`, one of the following,
+           which work directly on the sparse boundary matrices of this
+           complex:
+
+           - ``'gf2'`` -- homology with coefficients in `\GF{2}`, by
+             reducing the columns of the boundary matrices as bitsets;
+             see :mod:`homology.gf2`.  ``base_ring`` defaults to, and
+             must be, `\GF{2}`.
+
+           - ``'sparse'`` -- integral homology, by the elementary
+             divisors of the boundary matrices: unit pivots are
+             eliminated in Markowitz order, and only the residual
+             matrix goes through a dense Smith normal form; see
+             :mod:`homology.sparse_smith`.  ``base_ring`` defaults to,
+             and must be, `\ZZ`.
+
+           - ``'screened'`` -- as ``'sparse'``, but the Smith normal
+             form of a boundary matrix is only computed if its ranks
+             over `\QQ` and over `\GF{p}` for the primes in the
+             argument ``primes`` (by default ``(2, 3)``) disagree.
+             Torsion whose order is prime to all of these primes is
+             not detected, and a ``RuntimeWarning`` is issued when a
+             boundary matrix cannot be proven free of it.  The ranks are computed by ``processes``
+             processes (by default 1) in parallel; see
+             :func:`homology.sparse_smith.screened_homology`.
+
+           - ``'coreduction'`` -- as ``'sparse'``, after removing a
+             vertex and then coreduction pairs from the cells of this
+             complex; see :mod:`homology.coreduction`.
+
+           - ``'morse'`` -- as ``'sparse'``, on the Morse complex of an
+             acyclic matching of the cells of this complex built by
+             coreductions; see :mod:`homology.morse`.
+
+           - ``'reduction'`` -- as ``'sparse'``, on the chain complex
+             reduced by eliminating pairs of cells with unit incidence
+             coefficients; see :mod:`homology.reduction`.
+
+        The other arguments are those of
+        :meth:`GenericCellComplex.homology`: ``base_ring``,
+        ``subcomplex``, ``generators``, ``cohomology``, ``verbose``
+        and ``reduced``.  The algorithms above do not compute
+        generators, and the integral ones do not compute cohomology,
+        whose torsion is in the dimensions above that of homology:
+        they raise ``NotImplementedError`` if ``cohomology`` is true.
+
+        EXAMPLES::
+
+            >>> RP2 = cubical_complexes.RealProjectivePlane()
+            >>> RP2.homology(algorithm='gf2')
+            {0: Vector space of dimension 0 over Finite Field of size 2,
+             1: Vector space of dimension 1 over Finite Field of size 2,
+             2: Vector space of dimension 1 over Finite Field of size 2}
+            >>> RP2.homology(1, algorithm='gf2')
+            Vector space of dimension 1 over Finite Field of size 2
+            >>> RP2.homology(algorithm='sparse')
+            {0: 0, 1: C2, 2: 0}
+            >>> RP2.homology(algorithm='sparse', reduced=False)
+            {0: Z, 1: C2, 2: 0}
+            >>> RP2.homology(algorithm='screened', primes=(2,), processes=2)
+            {0: 0, 1: C2, 2: 0}
+            >>> RP2.homology(algorithm='coreduction', reduced=False)
+            {0: Z, 1: C2, 2: 0}
+            >>> RP2.homology(algorithm='morse')
+            {0: 0, 1: C2, 2: 0}
+            >>> RP2.homology(algorithm='reduction')
+            {0: 0, 1: C2, 2: 0}
+            >>> RP2.cohomology(algorithm='sparse')
+            Traceback (most recent call last):
+            ...
+            NotImplementedError: the 'sparse' algorithm does not compute cohomology
+        """
+        algorithm = kwds.get("algorithm")
+        if algorithm == "gf2":
+            from .gf2 import betti_numbers
+            base_ring = kwds.get("base_ring", GF(2))
+            if base_ring != GF(2):
+                raise ValueError("the 'gf2' algorithm computes homology over GF(2)")
+            (dims, subcomplex) = self._homology_arguments(dim, **kwds)
+            betti = betti_numbers(self, dims, subcomplex,
+                                  reduced=kwds.get("reduced", True))
+            groups = dict((d, HomologyGroup(b, base_ring))
+                          for (d, b) in betti.items())
+            return self._homology_answer(dim, groups, base_ring)
+        if algorithm in ("sparse", "screened", "coreduction", "morse",
+                         "reduction"):
+            from .coreduction import coreduced_homology
+            from .morse import morse_homology
+            from .reduction import reduction_homology
+            from .sparse_smith import integral_homology, screened_homology
+            base_ring = kwds.get("base_ring", ZZ)
+            if base_ring != ZZ:
+                raise ValueError("the '%s' algorithm computes homology over ZZ"
+                                 % algorithm)
+            if kwds.get("cohomology", False):
+                raise NotImplementedError(
+                    "the '%s' algorithm does not compute cohomology" % algorithm)
+            (dims, subcomplex) = self._homology_arguments(dim, **kwds)
+            reduced = kwds.get("reduced", True)
+            if algorithm == "sparse":
+                answer = integral_homology(self, dims, subcomplex, reduced)
+            elif algorithm == "coreduction":
+                answer = coreduced_homology(self, dims, subcomplex, reduced)
+            elif algorithm == "morse":
+                answer = morse_homology(self, dims, subcomplex, reduced)
+            elif algorithm == "reduction":
+                answer = reduction_homology(self, dims, subcomplex, reduced)
+            else:
+                answer = screened_homology(
+                    self, dims, subcomplex, reduced,
+                    primes=kwds.get("primes", (2, 3)),
+                    processes=kwds.get("processes", 1))
+            groups = {}
+            for (d, (rank, torsion)) in answer.items():
+                invfac = sorted(torsion) + [0] * rank
+                groups[d] = HomologyGroup(len(invfac), base_ring, invfac)
+            return self._homology_answer(dim, groups, base_ring)
+        return GenericCellComplex.homology(self, dim=dim, **kwds)
+
+    def betti_numbers(self, base_ring=QQ, dims=None, subcomplex=None):
+        r"""
+        The Betti numbers of this cubical complex, from the ranks of
+        its boundary matrices only.
+
+        Unlike :meth:`homology`, this computes no Smith normal form
+        and no bases, which saves time and memory on large complexes.
+        As :meth:`betti`, it computes unreduced homology.
+
+        :param base_ring: `\QQ` or `\GF{p}` for a prime `p`.
+          Over `\GF{2}`, the ranks are computed by :mod:`homology.gf2`,
+          otherwise by sparse elimination in
+          :mod:`homology.sparse_smith`.
+        :param dims: the dimensions in which to compute the Betti
+          numbers, by default all of them
+        :param subcomplex: compute the homology relative to this
+          subcomplex
+        :return: a dictionary of Betti numbers keyed by dimension
+
+        EXAMPLES::
+
+            >>> RP2 = cubical_complexes.RealProjectivePlane()
+            >>> RP2.betti_numbers()
+            {0: 1, 1: 0, 2: 0}
+            >>> RP2.betti_numbers(GF(2))
+            {0: 1, 1: 1, 2: 1}
+            >>> RP2.betti_numbers(GF(3), dims=[1])
+            {1: 0}
+            >>> RP2.betti_numbers(ZZ)
+            Traceback (most recent call last):
+            ...
+            ValueError: Betti numbers are computed over QQ or GF(p)
+        """
+        if not base_ring.is_prime_field():
+            raise ValueError("Betti numbers are computed over QQ or GF(p)")
+        if dims is None:
+            dims = range(self.dimension()+1)
+        dims = sorted(set(dims))
+        subcomplex = _subcomplex_key(subcomplex)
+        if base_ring == GF(2):
+            from .gf2 import betti_numbers
+            return betti_numbers(self, dims, subcomplex)
+        from .sparse_smith import betti_numbers
+        return betti_numbers(self, dims, subcomplex,
+                             base_ring.characteristic())
+
+    def _homology_arguments(self, dim=None, subcomplex=None,
+                            generators=False, **kwds):
+        """
+        Check the arguments of :meth:`homology` for the algorithms
+        implemented here.
+
+        :return: a pair: the list of dimensions in which to compute
+          homology, and the subcomplex, None if it was None or empty,
+          so that it shares the caches of :meth:`cells` and
+          :meth:`n_cells`
+
+        EXAMPLES::
+
+            >>> C = cubical_complexes.Cube(2)
+            >>> C._homology_arguments(1)
+            ([1], None)
+            >>> C._homology_arguments(1, subcomplex=CubicalComplex())
+            ([1], None)
+            >>> C._homology_arguments(generators=True)
+            Traceback (most recent call last):
+            ...
+            NotImplementedError: this algorithm does not compute generators
+        """
+        if generators:
+            raise NotImplementedError("this algorithm does not compute generators")
+        if dim is None:
+            dims = list(range(self.dimension()+1))
+        elif isinstance(dim, (list, tuple)) or hasattr(dim, "__iter__"):
+            dims = list(dim)
+        else:
+            dims = [dim]
+        return (dims, _subcomplex_key(subcomplex))
+
+    def _homology_answer(self, dim, groups, base_ring):
+        """
+        Format the homology groups computed by :meth:`homology` as
+        :meth:`GenericCellComplex.homology` does.
+
+        :param dim: the argument ``dim`` of :meth:`homology`
+        :param groups: dictionary of homology groups keyed by dimension
+        :param base_ring: the coefficient ring
+        :return: the group in dimension ``dim`` if it is an integer,
+          otherwise a dictionary of the groups in the dimensions
+          ``dim`` (by default, all dimensions of this complex)
+        """
+        zero = HomologyGroup(0, base_ring)
+        if dim is None:
+            dim = range(self.dimension()+1)
+        elif not (isinstance(dim, (list, tuple)) or hasattr(dim, "__iter__")):
+            return groups.get(dim, zero)
+        return dict((d, groups.get(d, zero)) for d in dim)
+
     def alexander_whitney(self, cube, dim_left):
         r"""
         Subdivide ``cube`` in this cubical complex into pairs of cubes.
@@ -19,6 +19,25 @@ dictionary would look like the following:
 
 Thus, face_d has O(2d*n)=O(d*n) keys, since each cube of dimension d has 2d
 faces (see Wikipedia:Hypercube#Elements).
+
+A key is free when its list has a single cube. To find free faces without
+scanning face_d, collapse_all keeps a FreeFaces index of them, bucketed by
+dimension, which add_maximal and collapse update for the keys they touch.
+
+The functions on face_d hash whole cubes at every lookup and scan lists to
+remove cubes. FaceGraph holds the same data with each cube numbered once:
+the keys and values are integers, the lists are sets of cofaces, and the
+faces of each cube are computed once. collapse_all runs on a FaceGraph, and
+FaceGraph.face_dict converts it back to a face_d.
+
+The functions on face_d are not adapters over FaceGraph: they update face_d
+and its FreeFaces index in place, in O(d^2) per collapse, which a round trip
+through a FaceGraph would make O(n). They are kept as the reference which
+the tests check FaceGraph against, and new code should use FaceGraph.
+
+Debug messages are only built when the logger is enabled for them, and
+collapse_all takes a homology.tracing.Trace to count collapses and promoted
+faces by dimension and to time its phases.
 """
 
 from sage.all import *
@@ -26,13 +45,74 @@ from functools import reduce
 
 import random  # TODO: delete me
 import logging
+from collections import deque
+
+from .tracing import phase
 
 # Logging configuration: by default, produce no output
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
-def add_maximal(face_d, cube):
+class FreeFaces(object):
+    """ The free faces of face_d, bucketed by dimension
+
+    Keys change buckets only when add_maximal or collapse touch them, and
+    those call update for each key whose list they change. FaceGraph uses add
+    and discard directly, with integer faces. The highest
+    bucket which may be nonempty is kept, so that a free face of maximal
+    dimension comes out in O(1) amortized time.
+
+        >>> from homology.cubical_complex import Cube
+        >>> index = FreeFaces(face_dict([Cube([[0, 1], [0, 1]])]))
+        >>> index.free_face().dimension()
+        1
+        >>> len(index)
+        4
+    """
+    def __init__(self, face_d=()):
+        # self._buckets[k]: the set of free faces of dimension k
+        self._buckets = []
+        self._top = -1
+        for face in face_d:
+            self.update(face_d, face)
+
+    def update(self, face_d, face):
+        """ Put face in its bucket if it is a free face of face_d, and take it
+        out otherwise """
+        if face is None:
+            return
+        if len(face_d.get(face, ())) == 1:
+            self.add(face, face.dimension())
+        else:
+            self.discard(face, face.dimension())
+
+    def add(self, face, dim):
+        """ Put face in the bucket of dimension dim """
+        while len(self._buckets) <= dim:
+            self._buckets.append(set())
+        self._buckets[dim].add(face)
+        if dim > self._top:
+            self._top = dim
+
+    def discard(self, face, dim):
+        """ Take face out of the bucket of dimension dim, if it is there """
+        if dim < len(self._buckets):
+            self._buckets[dim].discard(face)
+
+    def free_face(self):
+        """ A free face of maximal dimension, or False if there are none """
+        while self._top >= 0 and not self._buckets[self._top]:
+            self._top -= 1
+        if self._top < 0:
+            return False
+        return next(iter(self._buckets[self._top]))
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets)
+
+
+def add_maximal(face_d, cube, free=None):
     """ Add a newly maximal cube by introducing its faces as keys
 
     We add cubes with no faces (the empty cube, vertices) to the special key
@@ -71,19 +151,23 @@ def add_maximal(face_d, cube):
 
         >>> len(add_maximal(dict(), Cube([[0, 1], [0, 1], [0, 1]])))
         6
+
+    If free is a FreeFaces index of face_d, it is kept up to date.
     """
     # assert that it's not the face of some other cube
     assert face_d.get(cube, None) is None
 
     # If it's a point, add it to the key None
     faces = cube.faces()
-    faces = [None] if faces == [] else faces
+    faces = (None,) if faces == () else faces
 
     for face in faces:
         try:
             face_d[face].append(cube)
         except KeyError:
             face_d[face] = [cube]
+        if free is not None:
+            free.update(face_d, face)
 
     return face_d
 
@@ -127,7 +211,7 @@ def face_dict(maximal_cells):
     return reduce(lambda d, cube: add_maximal(d, cube), maximal_cells, dict())
 
 
-def collapse(face_d, free_face, logger=logger):
+def collapse(face_d, free_face, logger=logger, free=None):
     """ Collapse a single free face, and update face_d accordingly.
 
     The key realization of this algorithm is that collapsing is a local
@@ -137,6 +221,9 @@ def collapse(face_d, free_face, logger=logger):
     NB: This only works if free_face is a free face of maximal dimension, i.e.
     there are no free faces of higher dimension.
 
+    If free is a FreeFaces index of face_d, it is kept up to date: only
+    free_face and the faces of the collapsed cell can change buckets.
+
     Runtime: O(d^2)
         In the worst case, runs add_maximal (O(d)) for each face of the maximal
         cube which free_face is a face of.
@@ -184,10 +271,12 @@ def collapse(face_d, free_face, logger=logger):
     # the unique maximal cell which this free face is a face of
     remove = face_d[free_face][0]
 
-    logger.debug("Collapsing {} by {}".format(remove, free_face))
+    logger.debug("Collapsing %s by %s", remove, free_face)
 
     # Remove the free face
     face_d.pop(free_face)
+    if free is not None:
+        free.update(face_d, free_face)
 
     # Remove the maximal cell and add all of the other faces of "remove" back
     # to the complex. We only need to add the faces that are not already
@@ -201,14 +290,19 @@ def collapse(face_d, free_face, logger=logger):
         # If it's now maximal, then add it as a maximal face
         if face_d[face] == []:
             face_d.pop(face)
-            face_d = add_maximal(face_d, face)
+            if free is not None:
+                free.update(face_d, face)
+            face_d = add_maximal(face_d, face, free)
         # Otherwise, it might now be free! Yay!
+        elif free is not None:
+            free.update(face_d, face)
 
         # We collapsed it
     assert face_d.get(free_face, None) is None
 
-    logger.debug("After collapsing: {}".format(
-        face_dict_to_complex(face_d).maximal_cells()))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("After collapsing: %s",
+                     face_dict_to_complex(face_d).maximal_cells())
 
     return face_d
 
@@ -230,6 +324,226 @@ def face_dict_to_complex(face_d, maximality_check=False):
     return CubicalComplex(maximal, maximality_check=maximality_check)
 
 
+class FaceGraph(object):
+    """ The data of face_d, with cubes numbered by integers
+
+    self.cubes[i] is the cube numbered i, and self.cofaces[i] the set of the
+    maximal cubes of which it is a primary face: the keys of face_d are the
+    numbers whose set is nonempty. self.maximal is the set of maximal cubes,
+    including the vertices face_d keeps under None, and self.free a FreeFaces
+    index of the free faces. If trace is a Trace, collapse counts the
+    "collapses" and the faces "promoted" to maximal by dimension.
+
+    The cubes in protected and all their faces are flagged after the maximal
+    cells are added, and never go into self.free or the worklist of
+    collapse_free_pairs, so they are never removed. Only they are kept: the
+    other cubes, including the cubes of which they are faces, can still be
+    collapsed. Raise ValueError if a protected cube is not a face of a maximal
+    cell: this is a lookup in the index of numbered cubes, and only cubes
+    which are not maximal or primary faces of maximal cubes are tested
+    against the maximal cubes one by one.
+
+    Cubes are hashed once, when they are numbered, and the faces of a cube
+    are numbered the first time it becomes maximal. After that, add_maximal
+    and collapse only work on integers and sets.
+
+        >>> from homology.cubical_complex import Cube
+        >>> G = FaceGraph([Cube([[0, 1], [0]]), Cube([[1], [0, 1]])])
+        >>> len(G.cofaces[G.id(Cube([[1], [0]]))])
+        2
+        >>> G.collapse(G.id(Cube([[0], [0]])))
+        >>> sorted(G.maximal_cells())
+        [[1,1] x [0,1]]
+        >>> G = FaceGraph([Cube([[0, 1], [0]])], protected=[Cube([[0], [0]])])
+        >>> G.free.free_face() == G.id(Cube([[1], [0]]))
+        True
+        >>> FaceGraph([Cube([[0, 1], [0]])], protected=[Cube([[2], [0]])])
+        Traceback (most recent call last):
+        ...
+        ValueError: The protected cubes are not all in the complex.
+    """
+    def __init__(self, maximal_cells=(), trace=None, protected=()):
+        self.trace = trace
+        self.cubes = []
+        self.cofaces = []
+        self.maximal = set()
+        self.free = FreeFaces()
+        self._ids = {}
+        self._dimensions = []
+        # self._faces[i]: the numbers of the primary faces of cube i, or None
+        # if they haven't been needed yet
+        self._faces = []
+        # self._protected[i]: whether cube i must survive the collapses
+        self._protected = []
+        for cube in maximal_cells:
+            self.add_maximal(self.id(cube))
+        stack = []
+        for cube in protected:
+            if cube not in self._ids and not any(
+                    cube.is_face(self.cubes[m]) for m in self.maximal):
+                raise ValueError("The protected cubes are not all in the complex.")
+            stack.append(self.id(cube))
+        while stack:
+            i = stack.pop()
+            if not self._protected[i]:
+                self._protected[i] = True
+                if self.cofaces[i]:
+                    self.free.discard(i, self._dimensions[i])
+                stack.extend(self.faces(i))
+
+    def id(self, cube):
+        """ The number of a cube, which is given one if it has none yet """
+        try:
+            return self._ids[cube]
+        except KeyError:
+            i = self._ids[cube] = len(self.cubes)
+            self.cubes.append(cube)
+            self.cofaces.append(set())
+            self._dimensions.append(cube.dimension())
+            self._faces.append(None)
+            self._protected.append(False)
+            return i
+
+    def faces(self, i):
+        """ The numbers of the primary faces of cube i """
+        faces = self._faces[i]
+        if faces is None:
+            faces = self._faces[i] = tuple(
+                self.id(face) for face in self.cubes[i].faces())
+        return faces
+
+    def _update(self, face):
+        """ Keep self.free up to date after the cofaces of face change """
+        if len(self.cofaces[face]) == 1 and not self._protected[face]:
+            self.free.add(face, self._dimensions[face])
+        else:
+            self.free.discard(face, self._dimensions[face])
+
+    def add_maximal(self, i):
+        """ Make cube i maximal, as add_maximal
+
+        Runtime: O(d)
+        """
+        assert not self.cofaces[i]
+        self.maximal.add(i)
+        for face in self.faces(i):
+            self.cofaces[face].add(i)
+            self._update(face)
+
+    def collapse(self, free_face):
+        """ Collapse the free face numbered free_face, as collapse
+
+        Runtime: O(d^2)
+        """
+        cofaces = self.cofaces[free_face]
+        assert len(cofaces) == 1
+        assert not self._protected[free_face]
+        remove = cofaces.pop()
+        self.free.discard(free_face, self._dimensions[free_face])
+        trace = self.trace
+        if trace is not None:
+            trace.count("collapses", self._dimensions[remove])
+        self.maximal.discard(remove)
+        for face in self.faces(remove):
+            if face == free_face:
+                continue
+            cofaces = self.cofaces[face]
+            cofaces.discard(remove)
+            if cofaces:
+                self._update(face)
+            else:
+                self.free.discard(face, self._dimensions[face])
+                self.add_maximal(face)
+                if trace is not None:
+                    trace.count("promoted", self._dimensions[face])
+
+    def collapse_free_pairs(self):
+        """ Collapse free pairs of cells of every dimension, until there are
+        none left
+
+        A key of face_d may be a face of other cubes than the maximal ones in
+        its list, through their faces, so collapse relies on free faces of
+        maximal dimension, and even then may remove a vertex that is still a
+        face of a closed surface. Here, every cell of the complex is numbered
+        and counts the cells of which it is a primary face: it is free
+        exactly when that count is one. Collapsing a pair lowers the counts of the
+        faces of both cells, and the ones that drop to one go on a worklist,
+        so trees and dangling edges go as well as free faces of the top
+        dimension.
+
+        Runtime: O(d*m) for the m cells of the complex
+        """
+        # number the closure of the maximal cubes
+        cells = list(self.maximal)
+        seen = set(cells)
+        for i in cells:
+            for face in self.faces(i):
+                if face not in seen:
+                    seen.add(face)
+                    cells.append(face)
+        # up[i]: the cells of which cell i is a primary face
+        up = [[] for _ in self.cubes]
+        for i in cells:
+            for face in self.faces(i):
+                up[face].append(i)
+        alive = bytearray(len(self.cubes))
+        for i in cells:
+            alive[i] = 1
+        n_cofaces = [len(cofaces) for cofaces in up]
+        protected = self._protected
+        queue = deque(i for i in cells
+                      if n_cofaces[i] == 1 and not protected[i])
+        trace = self.trace
+        dimensions = self._dimensions
+        while queue:
+            free_face = queue.popleft()
+            if not alive[free_face] or n_cofaces[free_face] != 1:
+                continue
+            for remove in up[free_face]:
+                if alive[remove]:
+                    break
+            alive[remove] = alive[free_face] = 0
+            if trace is not None:
+                trace.count("collapses", dimensions[remove])
+            for face in self.faces(remove) + self.faces(free_face):
+                if face == free_face:
+                    continue
+                n_cofaces[face] -= 1
+                if n_cofaces[face] == 1 and not protected[face]:
+                    queue.append(face)
+                elif n_cofaces[face] == 0 and trace is not None:
+                    trace.count("promoted", dimensions[face])
+        # start the face dictionary over from the maximal cells left
+        for i in cells:
+            self.cofaces[i].clear()
+        self.maximal = set()
+        self.free = FreeFaces()
+        for i in cells:
+            if alive[i] and n_cofaces[i] == 0:
+                self.add_maximal(i)
+
+    def maximal_cells(self):
+        """ The set of maximal cubes """
+        return set(self.cubes[i] for i in self.maximal)
+
+    def to_complex(self, maximality_check=False):
+        """ The CubicalComplex of the maximal cubes, as face_dict_to_complex
+        """
+        return CubicalComplex(self.maximal_cells(),
+                              maximality_check=maximality_check)
+
+    def face_dict(self):
+        """ The face_d holding the same data """
+        face_d = {}
+        for (i, cofaces) in enumerate(self.cofaces):
+            if cofaces:
+                face_d[self.cubes[i]] = [self.cubes[j] for j in cofaces]
+        points = [self.cubes[i] for i in self.maximal if not self.faces(i)]
+        if points:
+            face_d[None] = points
+        return face_d
+
+
 def get_free_face(face_d, logger=logger):
     """ Get a single free face of maximal dimension from face_d
 
@@ -253,20 +567,33 @@ def get_free_face(face_d, logger=logger):
     for face, cubes in face_d.items():
         if face is not None and len(cubes) == 1:
             new_dimension = face.dimension()
-            logger.debug("Dimension of {} is {}".format(face, new_dimension))
             if new_dimension > maximal_dimension:
-                logger.debug("HERE")
                 maximal_dimension = new_dimension
                 maximal_free = face
 
-    logger.debug("Returning free face {}".format(maximal_free))
+    logger.debug("Returning free face %s", maximal_free)
     return maximal_free
 
 
-def collapse_all(cubical_complex, maximality_check=True, logger=logger):
+def collapse_all(cubical_complex, maximality_check=True, logger=logger,
+                 trace=None, full=False, protected=None):
     """ Perform all elementary collapses possible on a cubical complex
 
+    By default, this collapses free faces of maximal dimension, as long as
+    there are any. With full=True, it collapses free pairs of every dimension
+    instead, with FaceGraph.collapse_free_pairs.
+
+    If protected is a subcomplex (or an iterable of cubes), its cells and
+    their faces are all kept, so the result can be used for homology relative
+    to it. Raise ValueError if it is not a subcomplex of cubical_complex.
+
+    If trace is a homology.tracing.Trace, it gets the counters of the
+    FaceGraph and the timings of the phases "face graph", "collapse" and
+    "complex".
+
     Runtime: O(d^2n)
+        Each collapse costs O(d^2) on a FaceGraph, and its FreeFaces index
+        gives the next free face of maximal dimension in O(1) amortized time.
 
      * You can't collapse a point:
         >>> from homology.cubical_complex import Cube, CubicalComplex
@@ -303,13 +630,55 @@ def collapse_all(cubical_complex, maximality_check=True, logger=logger):
         >>> collapse_all(c)
         Cubical complex with 148 vertices and 308 cubes
 
+     * With full=True, free pairs of every dimension are collapsed, such as
+       an edge sticking out of a sphere:
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> S2 = cubical_complexes.Sphere(2)
+        >>> X = CubicalComplex(list(S2.maximal_cells()) +
+        ...                    [Cube([(1, 2), (1, 1), (1, 1)])])
+        >>> collapse_all(X, full=True) == S2
+        True
+
+     * Tracing counts the collapses by dimension of the collapsed cube:
+
+        >>> from homology.tracing import Trace
+        >>> trace = Trace()
+        >>> collapse_all(CubicalComplex([I2]), trace=trace)
+        Cubical complex with 1 vertex and 1 cube
+        >>> sorted(trace.counters["collapses"].items())
+        [(1, 3), (2, 1)]
+        >>> sorted(trace.timings)
+        ['collapse', 'complex', 'face graph']
+
+     * A protected vertex is kept:
+
+        >>> collapse_all(CubicalComplex([I]),
+        ...              protected=[Cube([(0, 0), (0, 0)])]).maximal_cells()
+        {[0,0] x [0,0]}
+
+     * A protected cube must be in the complex:
+
+        >>> collapse_all(CubicalComplex([I]), protected=[Cube([(2, 2), (0, 0)])])
+        Traceback (most recent call last):
+        ...
+        ValueError: The protected cubes are not all in the complex.
     """
-    logger.debug("*** Collapsing all in {}".format(cubical_complex))
-    face_set = set(cubical_complex.maximal_cells())
-    face_d = face_dict(face_set)
-    free = get_free_face(face_d)
-    while free is not False:  # Up to 2^n loops, if acyclic?
-        face_d = collapse(face_d, free, logger=logger)
-        free = get_free_face(face_d) # O(dn)
-
-    return face_dict_to_complex(face_d, maximality_check=maximality_check)
+    logger.debug("*** Collapsing all in %s", cubical_complex)
+    with phase(trace, "face graph"):
+        face_set = set(cubical_complex.maximal_cells())
+        if protected is None:
+            protected = ()
+        elif hasattr(protected, "maximal_cells"):
+            protected = protected.maximal_cells()
+        graph = FaceGraph(face_set, trace=trace, protected=protected)
+    with phase(trace, "collapse"):
+        if full:
+            graph.collapse_free_pairs()
+        free = graph.free.free_face()
+        while free is not False:  # Up to 2^n loops, if acyclic?
+            graph.collapse(free)
+            free = graph.free.free_face()
+
+    with phase(trace, "complex"):
+        return graph.to_complex(maximality_check=maximality_check)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Cubical complexes which grow by adding facets, with Betti numbers over GF(2)
+kept up to date.
+
+A CubicalComplex can't change after it is built, so growing it means
+recomputing everything. Here, the complex keeps an index of its cells and,
+for each dimension d, a reduced basis of the column space of the boundary
+matrix from dimension d to d-1 over GF(2), with columns as bitsets as in
+homology.gf2.
+
+Adding a cell never changes the boundary of the cells already there, so the
+column space only grows: the boundary of each new cell is reduced against
+the basis, and becomes a new basis column if it doesn't reduce to zero. The
+rank of each boundary matrix is the size of its basis, and the Betti numbers
+follow from the ranks and the numbers of cells.
+
+ * n is the number of cells of the complex
+ * Runtime: adding a facet costs O(c * k * n / w) for c new cells, which
+   take k reduction steps each, and a word size w; Betti numbers cost O(1)
+   per dimension
+"""
+from __future__ import absolute_import
+
+from .cubical_complex import Cube, CubicalComplex
+
+
+class IncrementalCubicalComplex(object):
+    """ A cubical complex which grows by adding facets
+
+        >>> from homology.cubical_complex import Cube
+        >>> X = IncrementalCubicalComplex([Cube([[0, 1], [0]]),
+        ...                                Cube([[1], [0, 1]])])
+        >>> X.betti_numbers()
+        {0: 1, 1: 0}
+        >>> X.add_facets([Cube([[0, 1], [1]]), Cube([[0], [0, 1]])])
+        3
+        >>> X.betti_numbers()
+        {0: 1, 1: 1}
+        >>> X.add_facet(Cube([[0, 1], [0, 1]]))
+        1
+        >>> X.betti_numbers()
+        {0: 1, 1: 0, 2: 0}
+    """
+    def __init__(self, maximal_faces=()):
+        # self._index: the id of each cell among the cells of its dimension
+        self._index = {}
+        # self._counts: the number of cells in each dimension
+        self._counts = []
+        # self._pivots: for each dimension d, a dictionary mapping the low of
+        # each reduced boundary column from dimension d to that column
+        self._pivots = []
+        # self._facets: the cubes added, some of which may no longer be
+        # maximal
+        self._facets = []
+        self.add_facets(maximal_faces)
+
+    def add_facets(self, cubes):
+        """ Add cubes and all their faces to the complex
+
+        Returns the number of new cells.
+        """
+        return sum(self.add_facet(cube) for cube in cubes)
+
+    def add_facet(self, cube):
+        """ Add a cube and all its faces to the complex
+
+        The new cells are added in increasing dimension, so the faces of each
+        one are already there. Returns the number of new cells.
+        """
+        cube = Cube(cube)
+        new = []
+        seen = set()
+        stack = [cube]
+        while stack:
+            cell = stack.pop()
+            if cell in self._index or cell in seen:
+                continue
+            seen.add(cell)
+            new.append(cell)
+            stack.extend(cell.faces())
+        new.sort(key=Cube.dimension)
+        for cell in new:
+            self._add_cell(cell)
+        if new:
+            self._facets.append(cube)
+        return len(new)
+
+    def _add_cell(self, cell):
+        """ Index a cell whose faces are already there, and reduce its
+        boundary against the basis of its dimension """
+        dim = cell.dimension()
+        if dim < 0:
+            return
+        while len(self._counts) <= dim:
+            self._counts.append(0)
+            self._pivots.append({})
+        self._index[cell] = self._counts[dim]
+        self._counts[dim] += 1
+        column = 0
+        for face in cell.faces():
+            column ^= 1 << self._index[face]
+        pivots = self._pivots[dim]
+        while column:
+            low = column.bit_length() - 1
+            if low not in pivots:
+                pivots[low] = column
+                break
+            column ^= pivots[low]
+
+    def dimension(self):
+        """ The dimension of the complex, -1 if it is empty """
+        return len(self._counts) - 1
+
+    def n_cells_count(self, n):
+        """ The number of cells of dimension n """
+        return self._counts[n] if 0 <= n < len(self._counts) else 0
+
+    def betti_numbers(self, dims=None, reduced=False):
+        """ Betti numbers over GF(2) of the complex, as gf2.betti_numbers
+
+        Arguments:
+         * dims: the dimensions to compute, by default all of them
+         * reduced: compute reduced homology
+        """
+        if dims is None:
+            dims = range(self.dimension() + 1)
+
+        def rank(dim):
+            if dim == 0:
+                # the augmentation has rank one if there are any vertices
+                return 1 if reduced and self.n_cells_count(0) > 0 else 0
+            if 0 < dim < len(self._pivots):
+                return len(self._pivots[dim])
+            return 0
+
+        return dict((dim, self.n_cells_count(dim) - rank(dim) - rank(dim + 1))
+                    for dim in sorted(set(dims)))
+
+    def cubical_complex(self):
+        """ The cubical complex of the cubes added so far """
+        return CubicalComplex(self._facets)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Discrete Morse theory on cubical complexes: an acyclic matching of the cells,
+and the Morse complex on the cells left unmatched (the critical cells), whose
+homology is that of the complex.
+
+The matching is built by coreductions, as in Harker, Mischaikow, Mrozek and
+Nanda, "Discrete Morse theoretic algorithms for computing homology of
+complexes and maps", Found. Comput. Math. 14 (2014). Cells are removed from
+the set S of remaining cells, one or two at a time:
+
+ * a cell of S of the lowest dimension has no faces in S, and is made
+   critical,
+ * a cell b whose boundary in S is +-a is matched with a.
+
+When a cell b is matched with a, all the other faces of b have been removed
+before. The boundary of a critical cell in the Morse complex is its boundary,
+pushed along the gradient paths: while it has a term in a cell a matched with
+b one dimension up, add the multiple of the boundary of b which cancels it.
+The new terms are in cells removed before a, so the cells a are processed
+from the last removed to the first, with a heap. What is left of the chain
+is its terms in critical cells.
+
+ * n is the number of cells of the complex
+ * Runtime: O(n * d) for the matching of cells with at most 2d faces and
+   cofaces; the Morse boundaries cost O(p log p) for p steps along gradient
+   paths
+"""
+from __future__ import absolute_import
+
+import heapq
+from collections import deque
+
+import numpy
+import scipy.sparse
+
+from .coreduction import _columns
+from .sparse_smith import elementary_divisors
+
+
+class MorseMatching(object):
+    """ An acyclic matching on the cells of a cubical complex, built by
+    coreductions
+
+    The cells are given by their indices among the cells of their dimension
+    (relative to subcomplex), which is the order of the bases of the boundary
+    matrices.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> M = MorseMatching(cubical_complexes.Torus())
+        >>> [len(M.critical[dim]) for dim in sorted(M.critical)]
+        [1, 2, 1]
+    """
+    def __init__(self, complex, subcomplex=None):
+        top = complex.dimension()
+        counts = [complex._n_cells_count(dim, subcomplex)
+                  for dim in range(top + 1)]
+        # self.faces[d][j]: the (index, coefficient) of the faces of the j-th
+        # d-cell
+        self.faces = [[()] * counts[0]] if top >= 0 else []
+        cofaces = []
+        for dim in range(1, top + 1):
+            mat = complex._boundary_matrix(dim, subcomplex)
+            self.faces.append(_columns(mat))
+            cofaces.append(_columns(mat.T))
+        if top >= 0:
+            cofaces.append([()] * counts[top])
+        # self.critical: the indices of the critical cells of each dimension
+        self.critical = dict((dim, []) for dim in range(top + 1))
+        self._is_critical = [bytearray(count) for count in counts]
+        # self.up[d]: the coface matched with each d-cell, or None
+        self.up = [[None] * count for count in counts]
+        # self.time[d]: when each d-cell was removed
+        self.time = [[None] * count for count in counts]
+        n_faces = [[len(f) for f in faces_d] for faces_d in self.faces]
+        alive = [bytearray([1]) * count for count in counts]
+        clock = [0]
+        queue = deque()
+
+        def remove(dim, i):
+            alive[dim][i] = 0
+            self.time[dim][i] = clock[0]
+            clock[0] += 1
+            for (c, _) in cofaces[dim][i]:
+                if alive[dim + 1][c]:
+                    n_faces[dim + 1][c] -= 1
+                    queue.append((dim + 1, c))
+
+        for dim in range(top + 1):
+            for cell in range(counts[dim]):
+                if not alive[dim][cell]:
+                    continue
+                # all cells of lower dimension are gone
+                self.critical[dim].append(cell)
+                self._is_critical[dim][cell] = 1
+                remove(dim, cell)
+                while queue:
+                    (d, b) = queue.popleft()
+                    if not alive[d][b] or n_faces[d][b] != 1:
+                        continue
+                    for (a, coefficient) in self.faces[d][b]:
+                        if alive[d - 1][a]:
+                            break
+                    if coefficient not in (1, -1):
+                        continue
+                    self.up[d - 1][a] = b
+                    remove(d - 1, a)
+                    remove(d, b)
+        for cells in self.critical.values():
+            cells.sort()
+
+    def boundary(self, dim, cell):
+        """ The boundary of a critical cell in the Morse complex, as a
+        dictionary mapping critical cells of dimension dim-1 to their
+        coefficients """
+        chain = dict(self.faces[dim][cell])
+        up = self.up[dim - 1]
+        time = self.time[dim - 1]
+        heap = [(-time[a], a) for a in chain if up[a] is not None]
+        heapq.heapify(heap)
+        while heap:
+            (_, a) = heapq.heappop(heap)
+            coefficient = chain.pop(a, 0)
+            if not coefficient:
+                continue
+            b = up[a]
+            pivot = dict(self.faces[dim][b])[a]
+            factor = coefficient * pivot  # the pivot is a unit
+            for (f, value) in self.faces[dim][b]:
+                if f == a:
+                    continue
+                if f not in chain and up[f] is not None:
+                    heapq.heappush(heap, (-time[f], f))
+                chain[f] = chain.get(f, 0) - factor * value
+        is_critical = self._is_critical[dim - 1]
+        return dict((f, value) for (f, value) in chain.items()
+                    if value and is_critical[f])
+
+    def morse_complex(self):
+        """ The boundary matrices of the Morse complex
+
+        Returns a dictionary mapping each d > 0 to the boundary matrix from
+        the critical d-cells to the critical (d-1)-cells, as a SciPy sparse
+        matrix with rows and columns in the order of self.critical.
+
+            >>> from homology.cubical_complex import cubical_complexes
+            >>> M = MorseMatching(cubical_complexes.RealProjectivePlane())
+            >>> M.morse_complex()[2].toarray().tolist()
+            [[-2]]
+        """
+        matrices = {}
+        for dim in sorted(self.critical):
+            if dim == 0:
+                continue
+            row = dict((f, r) for (r, f) in enumerate(self.critical[dim - 1]))
+            (rows, cols, data) = ([], [], [])
+            for (j, cell) in enumerate(self.critical[dim]):
+                for (f, value) in self.boundary(dim, cell).items():
+                    rows.append(row[f])
+                    cols.append(j)
+                    data.append(value)
+            shape = (len(self.critical[dim - 1]), len(self.critical[dim]))
+            matrices[dim] = scipy.sparse.csc_matrix(
+                (numpy.array(data, dtype=numpy.int64), (rows, cols)),
+                shape=shape)
+        return matrices
+
+
+def morse_homology(complex, dims, subcomplex=None, reduced=False):
+    """ Integral homology of a cubical complex, from its Morse complex
+
+    Arguments and result as sparse_smith.integral_homology.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> K = cubical_complexes.KleinBottle()
+        >>> sorted(morse_homology(K, [0, 1, 2]).items())
+        [(0, (1, [])), (1, (1, [2])), (2, (0, []))]
+    """
+    if subcomplex is not None and subcomplex.dimension() > -1:
+        reduced = False
+    matching = MorseMatching(complex, subcomplex)
+    divisors = dict((dim, elementary_divisors(mat))
+                    for (dim, mat) in matching.morse_complex().items())
+    groups = {}
+    for dim in dims:
+        cells = len(matching.critical.get(dim, ()))
+        if dim == 0:
+            # the augmentation has rank one if there are any vertices
+            rank_in = 1 if reduced and cells > 0 else 0
+        else:
+            rank_in = len(divisors.get(dim, []))
+        image = divisors.get(dim + 1, [])
+        groups[dim] = (cells - rank_in - len(image),
+                       [d for d in image if d != 1])
+    return groups
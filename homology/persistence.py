@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent homology with coefficients in GF(2) of filtered cubical complexes.
+
+A filtration is given by a value for each of some cubes, usually the maximal
+ones. A cell enters the filtration at the smallest value of the given cubes
+which contain it, so the faces of a cell never enter after it.
+
+The barcodes are computed by the column reduction of homology.gf2, on the
+boundary matrices with their rows and columns sorted by filtration value.
+The columns are sets of row positions rather than bitsets, as in
+homology.sparse_smith: the rows are sorted by value, so the low of a column
+is often near the end of the matrix, and a bitset would take memory
+proportional to it rather than to the number of entries.
+When the column of a (d+1)-cell reduces to a column with low i, the i-th
+d-cell gives birth to a class in H_d which dies when that (d+1)-cell enters.
+The d-cells which are not paired this way and whose own columns reduce to
+zero give birth to classes which never die.
+
+Dimensions are reduced from the top down with clearing, as in homology.gf2:
+the column of a d-cell which is the low of a reduced (d+1)-column reduces to
+zero, so it is skipped.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+from .cubical_complex import (Cube, CubicalComplex, _code_dimensions,
+                              _encode_cubes, _pad_codes, _row_index)
+
+
+def column_sets(mat, skip=()):
+    """ The columns of a sparse matrix as sets of the rows of their odd
+    entries, one at a time
+
+    Skipped columns are yielded as empty sets.
+
+        >>> import scipy.sparse
+        >>> mat = scipy.sparse.csc_matrix([[1, 0, 1], [-1, 2, 0], [0, 0, 1]])
+        >>> [sorted(column) for column in column_sets(mat, skip={0})]
+        [[], [], [0, 2]]
+    """
+    indptr = mat.indptr.tolist()
+    indices = mat.indices.tolist()
+    odd = (mat.data % 2 != 0).tolist()
+    for j in range(mat.shape[1]):
+        if j in skip:
+            yield set()
+            continue
+        yield set(indices[k] for k in range(indptr[j], indptr[j + 1])
+                  if odd[k])
+
+
+def reduce_column_sets(columns):
+    """ Reduce set columns from left to right, as gf2.reduce_columns
+
+    Returns a dictionary mapping the low of each nonzero reduced column to
+    the index of that column. A column which reduces to zero is dropped at
+    once, and only the reduced columns with a pivot are held until the end.
+
+        >>> reduce_column_sets([{0, 1}, {0, 2}, {1, 2}])
+        {1: 0, 2: 1}
+    """
+    pivots = {}
+    reduced = {}
+    for (j, column) in enumerate(columns):
+        while column:
+            low = max(column)
+            if low not in pivots:
+                pivots[low] = j
+                reduced[low] = column
+                break
+            column ^= reduced[low]
+    return pivots
+
+
+class FilteredCubicalComplex(CubicalComplex):
+    """ A cubical complex with a filtration value for each cell
+
+    The argument is a dictionary mapping cubes to their filtration values, or
+    a list of pairs (cube, value). The complex is the cubical complex of the
+    given cubes, and each cell enters the filtration at the smallest value of
+    the given cubes which contain it.
+
+        >>> from homology.cubical_complex import Cube
+        >>> X = FilteredCubicalComplex([(Cube([[0, 1], [0]]), 1),
+        ...                             (Cube([[1], [0, 1]]), 2),
+        ...                             (Cube([[0], [0, 1]]), 3)])
+        >>> X.filtration_values(0).tolist()
+        [1.0, 3.0, 1.0, 2.0]
+    """
+    def __init__(self, filtration):
+        if hasattr(filtration, "items"):
+            filtration = filtration.items()
+        filtration = tuple((Cube(cube), float(value))
+                           for (cube, value) in filtration)
+        CubicalComplex.__init__(self, [cube for (cube, _) in filtration])
+        self._filtration = filtration
+        # self._values: dictionary keyed by dimension of the
+        # filtration values of the cells, in the order of n_cells
+        self._values = None
+
+    def filtration_values(self, n):
+        """ The filtration values of the cells of dimension n, as a NumPy
+        array in the order of n_cells(n), which is also the order of the
+        bases of the boundary matrices.
+        """
+        if self._values is None:
+            self._values = self._cell_values()
+        return self._values.get(n, numpy.zeros(0))
+
+    def _cell_values(self):
+        """ The filtration values of all cells, keyed by dimension
+
+        The values go from the top dimension down: each cell takes the
+        smallest value of the given cubes equal to it and of the cells of one
+        dimension up which contain it, read off the boundary matrix.
+        """
+        cubes = [cube for (cube, _) in self._filtration]
+        given = _encode_cubes(cubes)
+        given_values = numpy.array([value for (_, value) in self._filtration])
+        given_dims = _code_dimensions(given)
+        codes = self._cell_codes()
+        values = {}
+        for dim in range(self.dimension(), -1, -1):
+            cells = codes[dim]
+            current = numpy.full(len(cells), numpy.inf)
+            mask = given_dims == dim
+            if mask.any():
+                width = max(cells.shape[1], given.shape[1])
+                index = _row_index(_pad_codes(cells, width),
+                                   _pad_codes(given[mask], width))
+                numpy.minimum.at(current, index, given_values[mask])
+            if dim + 1 in values:
+                mat = self._boundary_matrix(dim + 1)
+                numpy.minimum.at(current, mat.indices,
+                                 numpy.repeat(values[dim + 1],
+                                              numpy.diff(mat.indptr)))
+            values[dim] = current
+        return values
+
+    def persistence(self, dims=None):
+        """ The barcodes of this filtered complex, over GF(2)
+
+        Arguments:
+         * dims: the dimensions to compute, by default all of them
+
+        Returns a dictionary mapping each dimension to its sorted list of
+        bars (birth, death), with death infinite for classes which never
+        die. Bars with birth equal to death are left out.
+
+         * n is the number of cells
+         * Runtime: O(n^3 / w) in the worst case, for a word size w, but
+           close to linear on the very sparse matrices of cubical complexes
+
+            >>> from homology.cubical_complex import Cube
+            >>> X = FilteredCubicalComplex([(Cube([[0], [0]]), 0),
+            ...                             (Cube([[1], [1]]), 1),
+            ...                             (Cube([[0, 1], [0]]), 2),
+            ...                             (Cube([[1], [0, 1]]), 3),
+            ...                             (Cube([[0, 1], [1]]), 4),
+            ...                             (Cube([[0], [0, 1]]), 5),
+            ...                             (Cube([[0, 1], [0, 1]]), 6)])
+            >>> X.persistence()
+            {0: [(0.0, inf), (1.0, 3.0)], 1: [(5.0, 6.0)], 2: []}
+        """
+        top = self.dimension()
+        if dims is None:
+            dims = range(top + 1)
+        dims = sorted(set(dims))
+        # sort the cells of each dimension by value, and give each one its
+        # position in that order
+        order = {}
+        position = {}
+        for dim in range(top + 1):
+            order[dim] = numpy.argsort(self.filtration_values(dim),
+                                       kind="mergesort")
+            position[dim] = numpy.empty(len(order[dim]), dtype=numpy.int64)
+            position[dim][order[dim]] = numpy.arange(len(order[dim]))
+        # pivots[d] maps lows to columns of the reduced boundary matrix
+        # from dimension d, in positions
+        pivots = {}
+        for dim in sorted(set(dims) | set(d + 1 for d in dims), reverse=True):
+            if dim <= 0 or dim > top:
+                continue
+            mat = self._boundary_matrix(dim)[:, order[dim]].tocsc()
+            mat.indices = position[dim - 1][mat.indices]
+            mat.has_sorted_indices = False
+            cleared = set(pivots[dim + 1]) if dim + 1 in pivots else ()
+            pivots[dim] = reduce_column_sets(column_sets(mat, skip=cleared))
+        bars = {}
+        for dim in dims:
+            values = self.filtration_values(dim)[order.get(dim, [])]
+            deaths = pivots.get(dim + 1, {})
+            births = set(range(len(values))) - set(pivots.get(dim, {}).values())
+            births.difference_update(deaths)
+            current = [(float(values[i]), float("inf")) for i in births]
+            if deaths:
+                above = self.filtration_values(dim + 1)[order[dim + 1]]
+                current += [(float(values[i]), float(above[j]))
+                            for (i, j) in deaths.items()
+                            if values[i] < above[j]]
+            bars[dim] = sorted(current)
+        return bars
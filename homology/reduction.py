@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Algebraic reduction of chain complexes, after Kaczynski, Mischaikow and
+Mrozek, Computational Homology, Springer (2004), chapter 4.
+
+A reduction pair is a cell a of dimension d and a face b of a with a unit
+coefficient u in the boundary of a. Removing both leaves a chain complex with
+the same homology, with the boundaries
+
+ * of the other d-cells c: the boundary of c, minus w * u times the boundary
+   of a, where w is the coefficient of b in the boundary of c, which cancels
+   the b term,
+ * of the (d+1)-cells: their boundary without the a term,
+ * of the other cells: unchanged.
+
+The inclusion of the reduced complex in the complex maps c to c - w * u * a,
+and the other cells to themselves: this lifts cycles of the reduced complex,
+and so homology generators, back to cycles of the complex.
+
+Each elimination changes the boundaries of the cofaces of b, and fills them
+in with the other faces of a. As in homology.sparse_smith, pairs are chosen
+by Markowitz cost (r - 1)(c - 1), where r is the number of cofaces of b and c
+the number of faces of a, with a lazily updated heap, to keep the fill-in
+small.
+
+The data format for the boundary matrices here is as in homology.sparse_smith:
+for each dimension d, a pair (columns, rows) where columns maps each d-cell
+to a dictionary {face: coefficient} and rows maps each (d-1)-cell to the set
+of its cofaces.
+"""
+from __future__ import absolute_import
+
+import heapq
+
+import numpy
+import scipy.sparse
+
+from .sparse_smith import elementary_divisors, sparse_columns
+
+
+class ChainReduction(object):
+    """ The reduction of a chain complex of sparse boundary matrices
+
+    Arguments:
+     * matrices: a dictionary mapping each d > 0 to the boundary matrix from
+       dimension d to d-1, as a SciPy sparse integer matrix
+     * counts: a dictionary mapping each dimension to its number of cells
+     * lifts: keep track of the inclusion of the reduced complex
+
+    The cells are the indices of the rows and columns of the matrices.
+    After reduction, self.cells maps each dimension to the sorted list of
+    cells left, self.matrices() gives the reduced boundary matrices, and
+    self.lift(dim, chain) the inclusion.
+
+        >>> import scipy.sparse
+        >>> interval = {1: scipy.sparse.csc_matrix([[-1], [1]])}
+        >>> R = ChainReduction(interval, {0: 2, 1: 1})
+        >>> R.cells
+        {0: [1], 1: []}
+    """
+    def __init__(self, matrices, counts, lifts=False):
+        self._boundaries = dict((dim, sparse_columns(mat))
+                                for (dim, mat) in matrices.items())
+        self._alive = dict((dim, set(range(count)))
+                           for (dim, count) in counts.items())
+        # self._lifts[d][c]: the image of the d-cell c by the inclusion, if
+        # it is not c
+        self._lifts = dict((dim, {}) for dim in counts) if lifts else None
+        self._heap = []
+        for (dim, (columns, _)) in self._boundaries.items():
+            for (a, column) in columns.items():
+                for (b, value) in column.items():
+                    if value in (1, -1):
+                        self._push(dim, a, b)
+        self._reduce()
+        self.cells = dict((dim, sorted(cells))
+                          for (dim, cells) in self._alive.items())
+
+    def _push(self, dim, a, b):
+        (columns, rows) = self._boundaries[dim]
+        cost = (len(rows[b]) - 1) * (len(columns[a]) - 1)
+        heapq.heappush(self._heap, (cost, dim, a, b))
+
+    def _reduce(self):
+        heap = self._heap
+        while heap:
+            (cost, dim, a, b) = heapq.heappop(heap)
+            (columns, rows) = self._boundaries[dim]
+            column = columns.get(a)
+            if column is None or column.get(b) not in (1, -1):
+                continue  # this entry has changed since it was queued
+            current = (len(rows[b]) - 1) * (len(column) - 1)
+            if current > cost:
+                heapq.heappush(heap, (current, dim, a, b))
+                continue
+            self._eliminate(dim, a, b)
+
+    def _eliminate(self, dim, a, b):
+        """ Remove the reduction pair (a, b), with a of dimension dim """
+        (columns, rows) = self._boundaries[dim]
+        pivot_column = columns[a]
+        unit = pivot_column[b]
+        lifts = self._lifts
+        for c in list(rows[b]):
+            if c == a:
+                continue
+            column = columns[c]
+            factor = column[b] * unit
+            for (f, value) in pivot_column.items():
+                new = column.get(f, 0) - factor * value
+                if new:
+                    if f not in column:
+                        rows[f].add(c)
+                    column[f] = new
+                    if new in (1, -1) and f != b:
+                        self._push(dim, c, f)
+                else:
+                    del column[f]
+                    rows[f].discard(c)
+            if lifts is not None:
+                lift = lifts[dim].get(c, {c: 1})
+                for (cell, value) in lifts[dim].get(a, {a: 1}).items():
+                    new = lift.get(cell, 0) - factor * value
+                    if new:
+                        lift[cell] = new
+                    else:
+                        del lift[cell]
+                lifts[dim][c] = lift
+        for f in pivot_column:
+            rows[f].discard(a)
+        del columns[a]
+        del rows[b]
+        if lifts is not None:
+            lifts[dim].pop(a, None)
+            lifts[dim - 1].pop(b, None)
+        # a is no longer in the boundary of the cells one dimension up
+        if dim + 1 in self._boundaries:
+            (columns_up, rows_up) = self._boundaries[dim + 1]
+            for e in rows_up.pop(a, ()):
+                del columns_up[e][a]
+        # and b no longer has a boundary
+        if dim - 1 in self._boundaries:
+            (columns_down, rows_down) = self._boundaries[dim - 1]
+            for g in columns_down.pop(b, {}):
+                rows_down[g].discard(b)
+        self._alive[dim].discard(a)
+        self._alive[dim - 1].discard(b)
+
+    def matrices(self):
+        """ The reduced boundary matrices, with rows and columns in the order
+        of self.cells
+
+            >>> import scipy.sparse
+            >>> square = {1: scipy.sparse.csc_matrix([[-1, 0, -1, 0],
+            ...                                       [1, -1, 0, 0],
+            ...                                       [0, 1, 0, 1],
+            ...                                       [0, 0, 1, -1]])}
+            >>> R = ChainReduction(square, {0: 4, 1: 4}, lifts=True)
+            >>> (len(R.cells[0]), len(R.cells[1]), R.matrices()[1].nnz)
+            (1, 1, 0)
+
+        The edge left lifts to the cycle of all four edges:
+
+            >>> len(R.lift(1, {R.cells[1][0]: 1}))
+            4
+        """
+        matrices = {}
+        for (dim, (columns, _)) in self._boundaries.items():
+            row = dict((f, r) for (r, f) in enumerate(self.cells[dim - 1]))
+            (rows, cols, data) = ([], [], [])
+            for (j, cell) in enumerate(self.cells[dim]):
+                for (f, value) in columns.get(cell, {}).items():
+                    rows.append(row[f])
+                    cols.append(j)
+                    data.append(value)
+            matrices[dim] = scipy.sparse.csc_matrix(
+                (numpy.array(data, dtype=numpy.int64), (rows, cols)),
+                shape=(len(self.cells[dim - 1]), len(self.cells[dim])))
+        return matrices
+
+    def lift(self, dim, chain):
+        """ The image of a chain of the reduced complex in the complex
+
+        Arguments:
+         * chain: a dictionary mapping d-cells left to their coefficients
+
+        Returns a dictionary mapping d-cells of the complex to their
+        coefficients. The reduction must have been made with lifts=True.
+        """
+        if self._lifts is None:
+            raise ValueError("the reduction was made without lifts")
+        result = {}
+        for (cell, coefficient) in chain.items():
+            for (original, value) in self._lifts[dim].get(
+                    cell, {cell: 1}).items():
+                result[original] = result.get(original, 0) + coefficient * value
+        return dict((cell, value) for (cell, value) in result.items() if value)
+
+
+def reduce_complex(complex, subcomplex=None, lifts=False):
+    """ The reduction of the chain complex of a cubical complex
+
+    The cells are given by their indices among the cells of their dimension
+    (relative to subcomplex), which is the order of n_cells.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> R = reduce_complex(cubical_complexes.Torus())
+        >>> [len(R.cells[dim]) for dim in sorted(R.cells)]
+        [1, 2, 1]
+    """
+    top = complex.dimension()
+    matrices = dict((dim, complex._boundary_matrix(dim, subcomplex))
+                    for dim in range(1, top + 1))
+    counts = dict((dim, complex._n_cells_count(dim, subcomplex))
+                  for dim in range(top + 1))
+    return ChainReduction(matrices, counts, lifts)
+
+
+def reduction_homology(complex, dims, subcomplex=None, reduced=False):
+    """ Integral homology of a cubical complex, from its reduced chain complex
+
+    Arguments and result as sparse_smith.integral_homology.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> K = cubical_complexes.KleinBottle()
+        >>> sorted(reduction_homology(K, [0, 1, 2]).items())
+        [(0, (1, [])), (1, (1, [2])), (2, (0, []))]
+    """
+    if subcomplex is not None and subcomplex.dimension() > -1:
+        reduced = False
+    reduction = reduce_complex(complex, subcomplex)
+    divisors = dict((dim, elementary_divisors(mat))
+                    for (dim, mat) in reduction.matrices().items())
+    groups = {}
+    for dim in dims:
+        cells = len(reduction.cells.get(dim, ()))
+        if dim == 0:
+            # the augmentation has rank one if there are any vertices
+            rank_in = 1 if reduced and cells > 0 else 0
+        else:
+            rank_in = len(divisors.get(dim, []))
+        image = divisors.get(dim + 1, [])
+        groups[dim] = (cells - rank_in - len(image),
+                       [d for d in image if d != 1])
+    return groups
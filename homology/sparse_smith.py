@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Elementary divisors of sparse integer matrices, and integral homology of
+cubical complexes from them.
+
+Boundary matrices of cubical complexes are very sparse and most of their
+entries are units (1 or -1). A unit pivot can be eliminated exactly: add
+multiples of its column to the other columns to clear its row, then drop its
+row and column. Each such step contributes an elementary divisor of 1 and
+leaves the other elementary divisors unchanged.
+
+Pivots are chosen by Markowitz cost (r - 1)(c - 1), where r and c are the
+number of entries in the pivot's row and column. This bounds the fill-in
+created by each step, so the matrix stays sparse. When no unit entry is left,
+the residual matrix is usually tiny, and it is handed to Sage's dense Smith
+normal form.
+
+The same elimination computes ranks over GF(p), where every nonzero entry is
+a unit. Ranks over QQ and over a few small primes screen for torsion: most
+complexes have none, and their Smith forms need not be computed at all.
+
+The data format for a sparse matrix here is a pair (columns, rows): columns
+maps each column index to a dictionary {row index: nonzero entry}, and rows
+maps each row index to the set of columns with an entry in that row.
+"""
+import heapq
+import warnings
+
+
+def sparse_columns(mat, modulus=None):
+    """ Convert a SciPy sparse matrix to the (columns, rows) format
+
+    With a modulus, the entries are reduced modulo it.
+
+        >>> import scipy.sparse
+        >>> (columns, rows) = sparse_columns(
+        ...     scipy.sparse.csc_matrix([[1, 0], [2, 0]]))
+        >>> columns
+        {0: {0: 1, 1: 2}}
+        >>> sorted(rows[1])
+        [0]
+        >>> sparse_columns(scipy.sparse.csc_matrix([[1, 0], [2, 0]]), 2)[0]
+        {0: {0: 1}}
+    """
+    mat = mat.tocsc()
+    indptr = mat.indptr.tolist()
+    indices = mat.indices.tolist()
+    data = mat.data.tolist()
+    if modulus is not None:
+        data = [int(v) % modulus for v in data]
+    columns = {}
+    rows = {}
+    for j in range(mat.shape[1]):
+        column = {}
+        for k in range(indptr[j], indptr[j + 1]):
+            if data[k]:
+                column[indices[k]] = int(data[k])
+                rows.setdefault(indices[k], set()).add(j)
+        if column:
+            columns[j] = column
+    return (columns, rows)
+
+
+def eliminate_unit_pivots(columns, rows, modulus=None):
+    """ Eliminate unit pivots of a sparse matrix, in Markowitz order
+
+    The matrix, in the (columns, rows) format, is modified in place: what is
+    left is the residual matrix, with no unit entries. Returns the number of
+    pivots eliminated.
+
+    With a prime modulus p, the entries are integers mod p (see
+    sparse_columns), so every nonzero entry is a unit, nothing is left and
+    the number of pivots is the rank of the matrix over GF(p).
+
+    Runtime: O(p * f) for p pivots, where f is the fill-in of each step,
+        typically a small constant for boundary matrices
+
+     * A 2 x 2 matrix with a unit entry eliminates to a 1 x 1 matrix:
+
+        >>> (columns, rows) = ({0: {0: 1, 1: 2}, 1: {0: 3, 1: 4}},
+        ...                    {0: {0, 1}, 1: {0, 1}})
+        >>> eliminate_unit_pivots(columns, rows)
+        1
+        >>> columns
+        {1: {1: -2}}
+        >>> (columns, rows) = ({0: {0: 1, 1: 2}, 1: {0: 3, 1: 4}},
+        ...                    {0: {0, 1}, 1: {0, 1}})
+        >>> eliminate_unit_pivots(columns, rows, modulus=2)
+        1
+    """
+    if modulus is None:
+        def is_unit(value):
+            return value in (1, -1)
+
+        def inverse(unit):
+            return unit
+    else:
+        is_unit = bool
+
+        def inverse(unit):
+            return pow(unit, modulus - 2, modulus)
+
+    heap = []
+
+    def push(i, j):
+        heapq.heappush(heap, ((len(rows[i]) - 1) * (len(columns[j]) - 1), i, j))
+
+    for (j, column) in columns.items():
+        for (i, value) in column.items():
+            if is_unit(value):
+                push(i, j)
+
+    count = 0
+    while heap:
+        (cost, i, j) = heapq.heappop(heap)
+        pivot_column = columns.get(j)
+        if pivot_column is None or not is_unit(pivot_column.get(i, 0)):
+            continue  # this entry has changed since it was queued
+        current = (len(rows[i]) - 1) * (len(pivot_column) - 1)
+        if current > cost:
+            heapq.heappush(heap, (current, i, j))
+            continue
+        unit = inverse(pivot_column[i])
+        # clear row i: the other columns get a multiple of the pivot column
+        for k in list(rows[i]):
+            if k == j:
+                continue
+            column = columns[k]
+            factor = column[i] * unit
+            for (r, value) in pivot_column.items():
+                new = column.get(r, 0) - factor * value
+                if modulus is not None:
+                    new %= modulus
+                if new:
+                    if r not in column:
+                        rows[r].add(k)
+                    column[r] = new
+                    if is_unit(new) and r != i:
+                        push(r, k)
+                else:
+                    del column[r]
+                    rows[r].discard(k)
+            if not column:
+                del columns[k]
+        # row i is now zero except in the pivot column, so the pivot column
+        # can be cleared by row operations that change nothing else
+        for r in pivot_column:
+            rows[r].discard(j)
+            if not rows[r]:
+                del rows[r]
+        del columns[j]
+        count += 1
+    return count
+
+
+def elementary_divisors(mat):
+    """ The nonzero elementary divisors of a sparse integer matrix
+
+    Unit pivots are eliminated first by eliminate_unit_pivots, and only the
+    residual matrix goes through a dense Smith normal form.
+
+        >>> import scipy.sparse
+        >>> elementary_divisors(scipy.sparse.csc_matrix([[1, -1, 0], [0, 1, -1]]))
+        [1, 1]
+        >>> elementary_divisors(scipy.sparse.csc_matrix([[2, 0], [0, 3]]))
+        [1, 6]
+    """
+    (columns, rows) = sparse_columns(mat)
+    units = eliminate_unit_pivots(columns, rows)
+    return [1] * units + residual_elementary_divisors(columns)
+
+
+def residual_elementary_divisors(columns):
+    """ The nonzero elementary divisors of a sparse matrix with no unit
+    entries, by Sage's dense Smith normal form.
+
+        >>> residual_elementary_divisors({3: {5: 2, 7: 2}, 4: {5: 2}})
+        [2, 2]
+        >>> residual_elementary_divisors({})
+        []
+    """
+    if not columns:
+        return []
+    dense = _dense_matrix(columns)
+    return [int(d) for d in dense.elementary_divisors() if d != 0]
+
+
+def residual_rank(columns):
+    """ The rank over QQ of a sparse matrix with no unit entries, by Sage's
+    dense linear algebra.
+
+        >>> residual_rank({3: {5: 2, 7: 2}, 4: {5: 4, 7: 4}})
+        1
+    """
+    if not columns:
+        return 0
+    return int(_dense_matrix(columns).rank())
+
+
+def _dense_matrix(columns):
+    """ A dense Sage matrix over ZZ with the nonzero rows and columns of a
+    sparse matrix """
+    from sage.matrix.constructor import matrix
+    from sage.rings.integer_ring import ZZ
+    row_index = {}
+    entries = {}
+    for (j, (_, column)) in enumerate(sorted(columns.items())):
+        for (i, value) in column.items():
+            entries[(row_index.setdefault(i, len(row_index)), j)] = value
+    return matrix(ZZ, len(row_index), len(columns), entries, sparse=False)
+
+
+def rank(mat, characteristic=0):
+    """ The rank of a sparse integer matrix over QQ or GF(p)
+
+    Arguments:
+     * characteristic: 0 for QQ, or a prime p for GF(p)
+
+    Over GF(p), every nonzero entry is a pivot. Over QQ, the unit pivots are
+    eliminated over ZZ, and the rank of the residual matrix is computed
+    densely.
+
+        >>> import scipy.sparse
+        >>> mat = scipy.sparse.csc_matrix([[2, 0], [0, 3]])
+        >>> (rank(mat), rank(mat, 2), rank(mat, 3), rank(mat, 5))
+        (2, 1, 1, 2)
+    """
+    (columns, rows) = sparse_columns(mat, characteristic or None)
+    if characteristic:
+        return eliminate_unit_pivots(columns, rows, characteristic)
+    return eliminate_unit_pivots(columns, rows) + residual_rank(columns)
+
+
+def _rank_task(task):
+    """ rank, with its arguments as a tuple, for multiprocessing
+
+    Returns a pair: the rank, and whether the matrix is proven free of
+    torsion, which over QQ means that the unit pivots eliminate all of it.
+    """
+    (mat, characteristic) = task
+    if characteristic:
+        return (rank(mat, characteristic), True)
+    (columns, rows) = sparse_columns(mat)
+    units = eliminate_unit_pivots(columns, rows)
+    return (units + residual_rank(columns), not columns)
+
+
+def integral_homology(complex, dims, subcomplex=None, reduced=False):
+    """ Integral homology of a cubical complex
+
+    Arguments:
+     * dims: the dimensions to compute
+     * subcomplex: compute the homology relative to this subcomplex
+     * reduced: compute reduced homology (ignored if subcomplex is nonempty)
+
+    Returns a dictionary mapping each dimension d to a pair (rank, torsion):
+    H_d is the sum of Z^rank and of Z/t for t in torsion.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> RP2 = cubical_complexes.RealProjectivePlane()
+        >>> sorted(integral_homology(RP2, [0, 1, 2]).items())
+        [(0, (1, [])), (1, (0, [2])), (2, (0, []))]
+    """
+    divisors = {}
+    for dim in _matrix_dimensions(dims):
+        divisors[dim] = elementary_divisors(
+            complex._boundary_matrix(dim, subcomplex))
+    return _homology_groups(complex, dims, subcomplex, reduced, divisors)
+
+
+def screened_homology(complex, dims, subcomplex=None, reduced=False,
+                      primes=(2, 3), processes=1):
+    """ Integral homology of a cubical complex, screened for torsion by ranks
+
+    The rank of each boundary matrix is computed over QQ and over GF(p) for
+    each p in primes. These ranks agree exactly when no elementary divisor
+    of the matrix is divisible by any of the primes, and the matrix is then
+    taken to be free of torsion. The elementary divisors are computed only
+    for the matrices where the ranks disagree.
+
+    Torsion only shows up in the homology if its order is divisible by one
+    of the primes, so Z/5 is missed with the default primes (2, 3), and
+    integral_homology should be used if it can occur. A matrix whose unit
+    pivots eliminate all of it is proven free of torsion; for any other
+    matrix taken to be free of torsion, a RuntimeWarning is issued, since
+    the answer may then differ from that of integral_homology.
+
+    Arguments:
+     * dims, subcomplex, reduced: as for integral_homology
+     * primes: the primes to screen with
+     * processes: the number of processes computing ranks in parallel
+
+    Returns a dictionary as integral_homology does.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> K = cubical_complexes.KleinBottle()
+        >>> sorted(screened_homology(K, [0, 1, 2], processes=2).items())
+        [(0, (1, [])), (1, (1, [2])), (2, (0, []))]
+    """
+    matrices = dict((dim, complex._boundary_matrix(dim, subcomplex))
+                    for dim in _matrix_dimensions(dims))
+    characteristics = [0] + list(primes)
+    tasks = [(matrices[dim], p) for dim in sorted(matrices)
+             for p in characteristics]
+    if processes > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            ranks = pool.map(_rank_task, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        ranks = [_rank_task(task) for task in tasks]
+    divisors = {}
+    for (n, dim) in enumerate(sorted(matrices)):
+        screen = ranks[n * len(characteristics):(n + 1) * len(characteristics)]
+        if all(r == screen[0][0] for (r, _) in screen):
+            divisors[dim] = [1] * screen[0][0]
+            if not screen[0][1]:
+                warnings.warn(
+                    "H_%d may have torsion prime to %s, which is not detected"
+                    % (dim - 1, tuple(primes)), RuntimeWarning)
+        else:
+            divisors[dim] = elementary_divisors(matrices[dim])
+    return _homology_groups(complex, dims, subcomplex, reduced, divisors)
+
+
+def betti_numbers(complex, dims, subcomplex=None, characteristic=0):
+    """ Betti numbers of a cubical complex over QQ or GF(p), from ranks only
+
+    Arguments:
+     * dims: the dimensions to compute
+     * subcomplex: compute the homology relative to this subcomplex
+     * characteristic: 0 for QQ, or a prime p for GF(p)
+
+    Returns a dictionary mapping each dimension to its (unreduced) Betti
+    number.
+
+        >>> from homology.cubical_complex import cubical_complexes
+        >>> RP2 = cubical_complexes.RealProjectivePlane()
+        >>> betti_numbers(RP2, [0, 1, 2])
+        {0: 1, 1: 0, 2: 0}
+        >>> betti_numbers(RP2, [0, 1, 2], characteristic=3)
+        {0: 1, 1: 0, 2: 0}
+    """
+    ranks = {}
+    for dim in _matrix_dimensions(dims):
+        ranks[dim] = rank(complex._boundary_matrix(dim, subcomplex),
+                          characteristic)
+    return dict((dim, complex._n_cells_count(dim, subcomplex) -
+                 ranks.get(dim, 0) - ranks.get(dim + 1, 0))
+                for dim in dims)
+
+
+def _matrix_dimensions(dims):
+    """ The dimensions of the boundary matrices needed for homology in dims
+
+        >>> _matrix_dimensions([0, 2])
+        [1, 2, 3]
+    """
+    return sorted(d for d in set(dims) | set(d + 1 for d in dims) if d > 0)
+
+
+def _homology_groups(complex, dims, subcomplex, reduced, divisors):
+    """ Homology groups from the elementary divisors of boundary matrices
+
+    Arguments:
+     * divisors: a dictionary mapping each d to the nonzero elementary
+       divisors of the boundary matrix from dimension d to d-1
+
+    Returns a dictionary as integral_homology does.
+    """
+    if subcomplex is not None and subcomplex.dimension() > -1:
+        reduced = False
+    groups = {}
+    for dim in dims:
+        cells = complex._n_cells_count(dim, subcomplex)
+        if dim == 0:
+            # the augmentation has rank one if there are any vertices
+            rank_in = 1 if reduced and cells > 0 else 0
+        else:
+            rank_in = len(divisors.get(dim, []))
+        image = divisors.get(dim + 1, [])
+        torsion = [d for d in image if d != 1]
+        groups[dim] = (cells - rank_in - len(image), torsion)
+    return groups
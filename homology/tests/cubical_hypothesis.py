@@ -40,3 +40,12 @@ def random_complex(draw,
         [draw(random_cube(
             embed=embed, max_embed=max_embed)) for _ in range(cubes)],
         maximality_check=maximality_check)
+
+
+def small_cube(min_embed=3, max_embed=3):
+    """ Cubes with all their vertices in {0, 1, 2, 3}^n, so that random
+    cubes often share faces """
+    return strategies.lists(
+        strategies.tuples(strategies.integers(0, 2), strategies.booleans()),
+        min_size=min_embed, max_size=max_embed).map(
+            lambda intervals: Cube([(a, a + e) for (a, e) in intervals]))
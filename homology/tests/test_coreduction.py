@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import hypothesis
+from hypothesis import strategies
+
+from homology import coreduction, sparse_smith
+from homology.cubical_complex import CubicalComplex, cubical_complexes
+from homology.tests.cubical_hypothesis import small_cube
+
+
+def test_coreduced_homology():
+    for complex in [cubical_complexes.Sphere(3),
+                    cubical_complexes.Torus(),
+                    cubical_complexes.RealProjectivePlane(),
+                    cubical_complexes.SurfaceOfGenus(2, orientable=False)]:
+        dims = range(complex.dimension() + 1)
+        for reduced in (False, True):
+            assert (coreduction.coreduced_homology(complex, dims,
+                                                   reduced=reduced) ==
+                    sparse_smith.integral_homology(complex, dims,
+                                                   reduced=reduced))
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12),
+                  strategies.integers(0, 12), strategies.booleans())
+def test_coreduction(cubes, n_sub, reduced):
+    """ Coreduction keeps the homology, and the cells left form a chain
+    complex """
+    complex = CubicalComplex(cubes)
+    subcomplex = CubicalComplex(cubes[:n_sub])
+    dims = range(complex.dimension() + 1)
+    assert (coreduction.coreduced_homology(complex, dims, subcomplex,
+                                           reduced) ==
+            sparse_smith.integral_homology(complex, dims, subcomplex,
+                                           reduced))
+    (cells, matrices) = coreduction.coreduce(complex, subcomplex, reduced)
+    for dim in range(2, complex.dimension() + 1):
+        product = matrices[dim - 1].astype(int) * matrices[dim].astype(int)
+        assert not product.count_nonzero()
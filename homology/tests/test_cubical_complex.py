@@ -2,8 +2,14 @@
 # -*- mode: python -*-
 
 # from sage.all import *
+import hypothesis
+import numpy
+import pytest
+from hypothesis import strategies
+
 from homology import cubical_complex
 from homology.cubical_complex import Cube, CubicalComplex
+from homology.tests.cubical_hypothesis import random_cube, small_cube
 
 
 # TODO:
@@ -14,3 +20,186 @@ from homology.cubical_complex import Cube, CubicalComplex
 #     self.assertEqual([Cube([[0,0], [0,1]])], f([Cube([[0,0], [0,1]])]))
 #     self.assertEqual([Cube([[0,0], [0,1]])],
 #                      f(map(Cube, [[[0,0], [0,1]], [[0,0]], [[0,1]]])))
+
+
+@hypothesis.given(random_cube(max_embed=10))
+def test_cube_representation(cube):
+    """ The compact representation round-trips through the standard form """
+    copy = Cube(cube.tuple())
+    assert copy == cube
+    assert hash(copy) == hash(cube) == hash(cube.tuple())
+    assert [cube[i] for i in range(len(cube.tuple()))] == list(cube.tuple())
+    assert max(cube.dimension(), 0) == len(cube.nondegenerate_intervals())
+
+
+def test_face_cache_size():
+    cubes = [Cube([[i, i + 1], [0, 1]]) for i in range(3)]
+    try:
+        cubical_complex.set_face_cache_size(2)
+        faces = [cube.faces() for cube in cubes]
+        assert cubes[0].faces() is not faces[0]  # evicted
+        assert cubes[2].faces() is faces[2]
+        cubical_complex.set_face_cache_size(0)
+        assert Cube([[0, 1]]).faces() == (Cube([[1]]), Cube([[0]]))
+    finally:
+        cubical_complex.set_face_cache_size()
+
+
+def test_maximal_cubes_leave_no_faces():
+    """ The maximality check does not memoize faces """
+    cubes = [Cube([[0, 1], [0, 1], [0, 1]]), Cube([[0, 1], [0, 0], [0, 0]]),
+             Cube([[2, 3], [0, 1], [0, 0]])]
+    try:
+        cubical_complex.set_face_cache_size(None)
+        assert CubicalComplex.maximal_cubes(cubes) == [cubes[0], cubes[2]]
+        assert all(cube._faces is None for cube in cubes)
+    finally:
+        cubical_complex.set_face_cache_size()
+
+
+def _quadratic_maximal_cubes(cubes):
+    """ The original, pairwise maximality check """
+    maximal_cubes = []
+    for cube in cubes:
+        cube_is_maximal = True
+        cubes_to_be_removed = []
+        for other in maximal_cubes:
+            if other.is_face(cube):
+                cubes_to_be_removed.append(other)
+            elif cube_is_maximal:
+                cube_is_maximal = not cube.is_face(other)
+        for x in cubes_to_be_removed:
+            maximal_cubes.remove(x)
+        if cube_is_maximal:
+            maximal_cubes += [cube]
+    return maximal_cubes
+
+
+# Cubes on a small grid, so that many of them are faces of others
+grid_cube = small_cube(min_embed=2)
+
+
+@hypothesis.given(strategies.lists(grid_cube, max_size=30))
+def test_maximal_cubes(cubes):
+    assert (CubicalComplex.maximal_cubes(cubes) ==
+            _quadratic_maximal_cubes(cubes))
+
+
+@hypothesis.given(strategies.lists(grid_cube, min_size=1, max_size=10),
+                  strategies.lists(grid_cube, min_size=1, max_size=10))
+def test_is_subcomplex(cubes, other_cubes):
+    sub = CubicalComplex(cubes)
+    ambient = CubicalComplex(other_cubes)
+    expected = all(any(cube.is_face(other) for other in ambient._facets)
+                   for cube in sub._facets)
+    assert sub.is_subcomplex(ambient) == expected
+    # only packed cells are built
+    assert ambient._cells == {}
+    assert sub.is_subcomplex(CubicalComplex(cubes + other_cubes))
+
+
+@hypothesis.given(strategies.lists(grid_cube, min_size=1, max_size=10),
+                  strategies.integers(0, 10))
+def test_cells(cubes, n_sub):
+    """ The vectorized closure agrees with the cube-by-cube one """
+    complex = CubicalComplex(cubes)
+    assert complex.cells() == complex._cells_by_faces()
+    for subcomplex in [CubicalComplex(), CubicalComplex(cubes[:n_sub])]:
+        assert (complex.cells(subcomplex) ==
+                complex._cells_by_faces(subcomplex))
+
+
+@hypothesis.given(strategies.lists(grid_cube, min_size=1, max_size=10),
+                  strategies.integers(0, 10))
+def test_boundary_matrix(cubes, n_sub):
+    """ The vectorized boundary matrices agree with the cube-by-cube ones,
+    and compose to zero """
+    complex = CubicalComplex(cubes)
+    for subcomplex in [None, CubicalComplex(cubes[:n_sub])]:
+        for dim in range(1, complex.dimension() + 1):
+            mat = complex._boundary_matrix(dim, subcomplex)
+            (rows, columns, signs) = complex._boundary_entries_by_faces(
+                dim, subcomplex)
+            expected = numpy.zeros(mat.shape, dtype=int)
+            expected[rows, columns] = signs
+            assert (mat.toarray() == expected).all()
+            if dim > 1:
+                below = complex._boundary_matrix(dim - 1, subcomplex)
+                assert not (below.astype(int) * mat.astype(int)).count_nonzero()
+
+
+@hypothesis.given(strategies.lists(grid_cube, min_size=1, max_size=10),
+                  strategies.lists(strategies.integers(-1, 3)),
+                  strategies.integers(0, 10))
+def test_partial_cell_codes(cubes, dims, n_sub):
+    """ Computing some dimensions, directly or down from the top, gives
+    the same cells as the whole closure, and each one is computed once """
+    full = CubicalComplex(cubes)._cell_codes(CubicalComplex(cubes[:n_sub]))
+    complex = CubicalComplex(cubes)
+    subcomplex = CubicalComplex(cubes[:n_sub])
+    partial = complex._cell_codes(subcomplex, dims=dims)
+    assert sorted(partial) == sorted(dim for dim in full if dim in dims)
+    for dim in partial:
+        assert (partial[dim] == full[dim]).all()
+    rest = complex._cell_codes(subcomplex)
+    assert sorted(rest) == sorted(full)
+    for dim in rest:
+        assert (rest[dim] == full[dim]).all()
+        if dim in partial:
+            assert rest[dim] is partial[dim]
+
+
+def test_empty_subcomplex_key():
+    """ An empty subcomplex shares the caches of None """
+    complex = cubical_complex.cubical_complexes.Sphere(2)
+    cells = complex.cells()
+    mat = complex._boundary_matrix(2)
+    assert complex.cells(CubicalComplex()) is cells
+    assert complex._boundary_matrix(2, CubicalComplex()) is mat
+    assert complex._homology_arguments(subcomplex=CubicalComplex())[1] is None
+    complex.homology(algorithm="sparse")
+    assert list(complex._codes) == [None]
+    assert set(key for (dim, key) in complex._complex) == set([None])
+
+
+def test_boundary_cache_dir(tmpdir):
+    cubes = [Cube([[0, 1], [0, 1], [0, 0]]), Cube([[1, 2], [0, 0], [0, 1]])]
+    try:
+        cubical_complex.set_boundary_cache_dir(str(tmpdir))
+        cold = CubicalComplex(cubes)
+        matrices = [cold._boundary_matrix(dim) for dim in (1, 2)]
+        # the same facets in another order hit the cache
+        warm = CubicalComplex(cubes[::-1])
+        assert warm._n_cells_count(0) == 7
+        for (dim, mat) in zip((1, 2), matrices):
+            assert (warm._boundary_matrix(dim) != mat).nnz == 0
+        assert warm._codes == {}
+    finally:
+        cubical_complex.set_boundary_cache_dir()
+
+
+def test_betti_numbers():
+    from sage.rings.finite_rings.finite_field_constructor import GF
+    from sage.rings.integer_ring import ZZ
+    from sage.rings.rational_field import QQ
+    K = cubical_complex.cubical_complexes.KleinBottle()
+    assert K.betti_numbers() == {0: 1, 1: 1, 2: 0}
+    assert K.betti_numbers(QQ, dims=[1]) == {1: 1}
+    assert K.betti_numbers(GF(2)) == {0: 1, 1: 2, 2: 1}
+    assert K.betti_numbers(GF(3)) == K.betti_numbers()
+    with pytest.raises(ValueError):
+        K.betti_numbers(ZZ)
+
+
+@hypothesis.given(strategies.lists(grid_cube, min_size=0, max_size=10))
+def test_f_vector(cubes):
+    """ The streaming counts agree with the cells """
+    complex = CubicalComplex(cubes)
+    f_vector = complex.f_vector()
+    cells = complex.cells()
+    assert f_vector == [1] + [len(cells[dim])
+                              for dim in range(complex.dimension() + 1)]
+    # the counts are also read from the cells once they are known
+    assert complex.f_vector() == f_vector
+    assert complex.euler_characteristic() == sum(
+        (-1)**dim * len(cells[dim]) for dim in range(complex.dimension() + 1))
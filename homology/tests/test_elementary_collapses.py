@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import hypothesis
 import functools
+import pytest
 
 from homology.abrams_y import the_complex
-from homology.elementary_collapses import add_maximal, face_dict, face_dict_to_complex, get_free_face, collapse_all
+from homology.elementary_collapses import add_maximal, face_dict, face_dict_to_complex, get_free_face, collapse, collapse_all, FreeFaces, FaceGraph
 from homology.cubical_complex import Cube, CubicalComplex
+from homology.tracing import Trace
 from homology.tests.cubical_hypothesis import random_cube, random_complex, random_interval
 
 # For debugging functions that aren't working
@@ -88,6 +90,44 @@ def test_get_free_face(cube):
         face_dict(CubicalComplex([cube]))) is not False
 
 
+@hypothesis.given(
+    random_complex(
+        max_embed=5, max_cubes=10, maximality_check=True))
+def test_free_faces(complex):
+    """ The index stays in step with face_d through collapses """
+    face_d = face_dict(complex)
+    index = FreeFaces(face_d)
+    free = index.free_face()
+    while free is not False:
+        expected = get_free_face(face_d)
+        assert free.dimension() == expected.dimension()
+        assert len(index) == len(FreeFaces(face_d))
+        face_d = collapse(face_d, free, free=index)
+        free = index.free_face()
+    assert get_free_face(face_d) is False
+
+
+def canonical(face_d):
+    return dict((face, frozenset(cubes)) for face, cubes in face_d.items())
+
+
+@hypothesis.given(
+    random_complex(
+        max_embed=5, max_cubes=10, maximality_check=True))
+def test_face_graph(complex):
+    """ FaceGraph collapses as face_d does """
+    face_d = face_dict(complex)
+    graph = FaceGraph(complex.maximal_cells())
+    assert canonical(graph.face_dict()) == canonical(face_d)
+    free = graph.free.free_face()
+    while free is not False:
+        face_d = collapse(face_d, graph.cubes[free])
+        graph.collapse(free)
+        assert canonical(graph.face_dict()) == canonical(face_d)
+        free = graph.free.free_face()
+    assert graph.to_complex() == face_dict_to_complex(face_d)
+
+
 # TODO: this is slow
 # @hypothesis.given(given_complex())
 @hypothesis.given(
@@ -105,6 +145,65 @@ def test_collapse_all(cubical_complex):
         collapsed.homology(algorithm="no_chomp"))
 
 
+@hypothesis.given(
+    random_complex(
+        max_embed=5, max_cubes=10, maximality_check=True))
+def test_collapse_all_trace(cubical_complex):
+    """ Each collapse removes two cells """
+    trace = Trace()
+    collapsed = collapse_all(cubical_complex, trace=trace)
+    removed = sum(cubical_complex.f_vector()) - sum(collapsed.f_vector())
+    assert 2 * sum(trace.counters["collapses"].values()) == removed
+
+
+@hypothesis.given(
+    random_complex(
+        max_embed=5, max_cubes=20, maximality_check=True))
+@hypothesis.example(CubicalComplex([Cube([(0, 1), (0, 1), (0, 1)])]))  # I^3
+def test_collapse_all_full(cubical_complex):
+    """ Collapsing free pairs of every dimension leaves none, and keeps the
+    homology """
+    collapsed = collapse_all(cubical_complex, full=True)
+    trace = Trace()
+    collapse_all(collapsed, full=True, trace=trace)
+    assert not trace.counters["collapses"]
+
+    compare_homology(
+        cubical_complex.homology(algorithm="no_chomp"),
+        collapsed.homology(algorithm="no_chomp"))
+
+
+def test_collapse_all_full_whisker():
+    """ An edge sticking out of a sphere is collapsed through its free vertex
+    only """
+    sphere = [Cube([(0, 1), (0, 1), (v, v)]) for v in (0, 1)]
+    sphere += [Cube([(0, 1), (v, v), (0, 1)]) for v in (0, 1)]
+    sphere += [Cube([(v, v), (0, 1), (0, 1)]) for v in (0, 1)]
+    whisker = Cube([(1, 2), (1, 1), (1, 1)])
+    complex = CubicalComplex(sphere + [whisker])
+    assert collapse_all(complex, full=True) == CubicalComplex(sphere)
+
+
+@hypothesis.given(
+    random_complex(
+        max_embed=5, max_cubes=10, maximality_check=True),
+    hypothesis.strategies.booleans())
+def test_collapse_all_protected(cubical_complex, full):
+    """ The protected subcomplex survives the collapses """
+    protected = CubicalComplex(sorted(cubical_complex.maximal_cells())[:1])
+    collapsed = collapse_all(cubical_complex, full=full, protected=protected)
+    assert protected.is_subcomplex(collapsed)
+
+
+def test_collapse_all_protected_outside():
+    """ Protected cubes which are not in the complex are rejected """
+    complex = CubicalComplex([Cube([(0, 1), (0, 0)])])
+    with pytest.raises(ValueError):
+        collapse_all(complex, protected=[Cube([(0, 1), (0, 1)])])
+    with pytest.raises(ValueError):
+        collapse_all(complex, protected=CubicalComplex([Cube([(2, 2)])]))
+
+
 def test_collapse_all_the_complex():
     for i in [2, 3]:
         comp = the_complex(i)
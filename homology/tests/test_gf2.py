@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import hypothesis
+import numpy
+from hypothesis import strategies
+
+from homology import gf2
+from homology.cubical_complex import Cube, CubicalComplex, cubical_complexes
+from homology.tests.cubical_hypothesis import small_cube
+
+
+def dense_rank_mod2(mat):
+    """ Rank over GF(2) by Gaussian elimination on a dense matrix """
+    mat = numpy.array(mat, dtype=int) % 2
+    rank = 0
+    for col in range(mat.shape[1]):
+        rows = [r for r in range(rank, mat.shape[0]) if mat[r, col]]
+        if not rows:
+            continue
+        mat[[rank, rows[0]]] = mat[[rows[0], rank]]
+        for r in range(mat.shape[0]):
+            if r != rank and mat[r, col]:
+                mat[r] ^= mat[rank]
+        rank += 1
+    return rank
+
+
+def test_betti_numbers():
+    assert gf2.betti_numbers(cubical_complexes.Sphere(3)) == {
+        0: 1, 1: 0, 2: 0, 3: 1}
+    assert gf2.betti_numbers(cubical_complexes.Torus(), reduced=True) == {
+        0: 0, 1: 2, 2: 1}
+    # RP^2 has Z/2 torsion in H_1, which shows up in H_1 and H_2 mod 2
+    assert gf2.betti_numbers(cubical_complexes.RealProjectivePlane()) == {
+        0: 1, 1: 1, 2: 1}
+    C1 = cubical_complexes.Cube(1)
+    S0 = cubical_complexes.Sphere(0)
+    assert gf2.betti_numbers(C1, subcomplex=S0, reduced=True) == {0: 0, 1: 1}
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12))
+def test_ranks(cubes):
+    """ Bitset reduction with clearing gives the ranks of the matrices """
+    complex = CubicalComplex(cubes)
+    dims = range(1, complex.dimension() + 2)
+    ranks = gf2.ranks(complex, dims)
+    for dim in dims:
+        mat = complex._boundary_matrix(dim).toarray()
+        assert ranks[dim] == dense_rank_mod2(mat)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import hypothesis
+from hypothesis import strategies
+
+from homology import gf2
+from homology.cubical_complex import CubicalComplex
+from homology.incremental import IncrementalCubicalComplex
+from homology.tests.cubical_hypothesis import small_cube
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12),
+                  strategies.booleans())
+def test_betti_numbers(cubes, reduced):
+    """ After each facet, the Betti numbers are those of the whole complex """
+    X = IncrementalCubicalComplex()
+    for (n, cube) in enumerate(cubes):
+        X.add_facet(cube)
+        complex = CubicalComplex(cubes[:n + 1])
+        assert X.dimension() == complex.dimension()
+        assert (X.betti_numbers(reduced=reduced) ==
+                gf2.betti_numbers(complex, reduced=reduced))
+    assert X.cubical_complex() == CubicalComplex(cubes)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import hypothesis
+from hypothesis import strategies
+
+from homology import morse, sparse_smith
+from homology.cubical_complex import CubicalComplex, cubical_complexes
+from homology.tests.cubical_hypothesis import small_cube
+
+
+def test_morse_matching():
+    # the coreduction matching of a sphere or a torus is perfect
+    for (complex, critical) in [(cubical_complexes.Sphere(3), [1, 0, 0, 1]),
+                                (cubical_complexes.Torus(), [1, 2, 1])]:
+        matching = morse.MorseMatching(complex)
+        assert [len(matching.critical[dim])
+                for dim in sorted(matching.critical)] == critical
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12),
+                  strategies.integers(0, 12), strategies.booleans())
+def test_morse_homology(cubes, n_sub, reduced):
+    """ The Morse complex is a chain complex with the same homology """
+    complex = CubicalComplex(cubes)
+    subcomplex = CubicalComplex(cubes[:n_sub])
+    dims = range(complex.dimension() + 1)
+    assert (morse.morse_homology(complex, dims, subcomplex, reduced) ==
+            sparse_smith.integral_homology(complex, dims, subcomplex,
+                                           reduced))
+    matrices = morse.MorseMatching(complex, subcomplex).morse_complex()
+    for dim in range(2, complex.dimension() + 1):
+        assert not (matrices[dim - 1] * matrices[dim]).count_nonzero()
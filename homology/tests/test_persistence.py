@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import hypothesis
+from hypothesis import strategies
+
+from homology import gf2, persistence
+from homology.cubical_complex import Cube, CubicalComplex
+from homology.persistence import FilteredCubicalComplex
+from homology.tests.cubical_hypothesis import small_cube
+
+
+def test_filtration_values():
+    edge = Cube([[0, 1], [0]])
+    X = FilteredCubicalComplex({edge: 2, Cube([[0], [0]]): 1})
+    assert X.filtration_values(1).tolist() == [2.0]
+    assert X.filtration_values(0).tolist() == [1.0, 2.0]
+    assert X.persistence() == {0: [(1.0, float("inf"))], 1: []}
+
+
+@hypothesis.given(strategies.lists(
+    strategies.tuples(small_cube(), strategies.integers(0, 4)),
+    min_size=1, max_size=10))
+def test_persistence(filtration):
+    """ At each value, the bars alive are the Betti numbers of the
+    sublevel complex """
+    X = FilteredCubicalComplex(filtration)
+    bars = X.persistence()
+    for value in range(5):
+        cells = [cube for dim in range(X.dimension() + 1)
+                 for (cube, v) in zip(X.n_cells(dim),
+                                      X.filtration_values(dim))
+                 if v <= value]
+        sublevel = CubicalComplex(cells)
+        betti = gf2.betti_numbers(sublevel) if cells else {}
+        for dim in range(X.dimension() + 1):
+            alive = len([(b, d) for (b, d) in bars[dim] if b <= value < d])
+            assert alive == betti.get(dim, 0)
+
+
+@hypothesis.given(strategies.lists(strategies.sets(strategies.integers(0, 8)),
+                                   max_size=12))
+def test_reduce_column_sets(columns):
+    """ Set columns reduce as bitset columns do """
+    bitsets = [sum(1 << i for i in column) for column in columns]
+    assert (persistence.reduce_column_sets([set(c) for c in columns]) ==
+            gf2.reduce_columns(bitsets))
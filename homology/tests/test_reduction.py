@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import hypothesis
+import numpy
+from hypothesis import strategies
+
+from homology import reduction, sparse_smith
+from homology.cubical_complex import CubicalComplex, cubical_complexes
+from homology.tests.cubical_hypothesis import small_cube
+
+
+def test_reduce_complex():
+    # the chain complexes of spheres reduce to their homology
+    for n in range(1, 4):
+        R = reduction.reduce_complex(cubical_complexes.Sphere(n))
+        assert [len(R.cells[dim]) for dim in range(n + 1)] == (
+            [1] + [0] * (n - 1) + [1])
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12),
+                  strategies.integers(0, 12), strategies.booleans())
+def test_reduction_homology(cubes, n_sub, reduced):
+    complex = CubicalComplex(cubes)
+    subcomplex = CubicalComplex(cubes[:n_sub])
+    dims = range(complex.dimension() + 1)
+    assert (reduction.reduction_homology(complex, dims, subcomplex,
+                                         reduced) ==
+            sparse_smith.integral_homology(complex, dims, subcomplex,
+                                           reduced))
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12))
+def test_lift(cubes):
+    """ The lifts commute with the boundaries """
+    complex = CubicalComplex(cubes)
+    R = reduction.reduce_complex(complex, lifts=True)
+    matrices = R.matrices()
+
+    def vector(dim, chain):
+        result = numpy.zeros(complex._n_cells_count(dim), dtype=int)
+        for (cell, value) in chain.items():
+            result[cell] = value
+        return result
+
+    for dim in range(1, complex.dimension() + 1):
+        boundary = complex._boundary_matrix(dim).astype(int)
+        for (j, cell) in enumerate(R.cells[dim]):
+            reduced_boundary = dict(
+                (R.cells[dim - 1][i], matrices[dim][i, j])
+                for i in range(len(R.cells[dim - 1])))
+            assert (boundary.dot(vector(dim, R.lift(dim, {cell: 1}))) ==
+                    vector(dim - 1, R.lift(dim - 1, reduced_boundary))).all()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
+import hypothesis
+import numpy
+import pytest
+import scipy.sparse
+from hypothesis import strategies
+
+from homology import sparse_smith
+from homology.cubical_complex import Cube, CubicalComplex, cubical_complexes
+from homology.tests.cubical_hypothesis import small_cube
+
+
+def dense_elementary_divisors(mat):
+    """ Nonzero elementary divisors by elimination on a dense matrix """
+    mat = [[int(v) for v in row] for row in mat]
+    diagonal = []
+    while True:
+        entries = [(abs(v), i, j) for (i, row) in enumerate(mat)
+                   for (j, v) in enumerate(row) if v]
+        if not entries:
+            break
+        (_, i, j) = min(entries)
+        pivot = mat[i][j]
+        done = True
+        for r in range(len(mat)):
+            if r != i and mat[r][j]:
+                q = mat[r][j] // pivot
+                mat[r] = [a - q * b for (a, b) in zip(mat[r], mat[i])]
+                done = done and not mat[r][j]
+        for c in range(len(mat[i])):
+            if c != j and mat[i][c]:
+                q = mat[i][c] // pivot
+                for row in mat:
+                    row[c] -= q * row[j]
+                done = done and not mat[i][c]
+        if done:
+            diagonal.append(abs(pivot))
+            mat = [row[:j] + row[j + 1:] for (r, row) in enumerate(mat)
+                   if r != i]
+    # make each divisor divide the next
+    for i in range(len(diagonal)):
+        for j in range(i + 1, len(diagonal)):
+            (a, b) = (diagonal[i], diagonal[j])
+            diagonal[i] = gcd(a, b)
+            diagonal[j] = a * b // diagonal[i]
+    return sorted(diagonal)
+
+
+def test_integral_homology():
+    assert sparse_smith.integral_homology(
+        cubical_complexes.Sphere(2), [0, 1, 2]) == {
+            0: (1, []), 1: (0, []), 2: (1, [])}
+    assert sparse_smith.integral_homology(
+        cubical_complexes.KleinBottle(), [0, 1, 2], reduced=True) == {
+            0: (0, []), 1: (1, [2]), 2: (0, [])}
+    C1 = cubical_complexes.Cube(1)
+    S0 = cubical_complexes.Sphere(0)
+    assert sparse_smith.integral_homology(C1, [0, 1], S0, reduced=True) == {
+        0: (0, []), 1: (1, [])}
+
+
+matrices = strategies.integers(1, 6).flatmap(
+    lambda cols: strategies.lists(
+        strategies.lists(strategies.integers(-2, 2),
+                         min_size=cols, max_size=cols),
+        min_size=1, max_size=6))
+
+
+@hypothesis.given(matrices)
+def test_elementary_divisors(mat):
+    """ Unit elimination and the residual Smith form give the elementary
+    divisors of the whole matrix """
+    expected = dense_elementary_divisors(mat)
+    (columns, rows) = sparse_smith.sparse_columns(
+        scipy.sparse.csc_matrix(numpy.array(mat)))
+    units = sparse_smith.eliminate_unit_pivots(columns, rows)
+    assert all(v not in (1, -1)
+               for column in columns.values() for v in column.values())
+    residual = [[columns.get(j, {}).get(i, 0) for j in range(len(mat[0]))]
+                for i in range(len(mat))]
+    assert [1] * units + dense_elementary_divisors(residual) == expected
+
+
+@hypothesis.given(matrices, strategies.sampled_from([0, 2, 3, 5]))
+def test_rank(mat, characteristic):
+    """ Ranks over QQ and GF(p) agree with the elementary divisors """
+    divisors = dense_elementary_divisors(mat)
+    if characteristic:
+        divisors = [d for d in divisors if d % characteristic]
+    mat = scipy.sparse.csc_matrix(numpy.array(mat))
+    assert sparse_smith.rank(mat, characteristic) == len(divisors)
+
+
+def test_screened_homology():
+    for complex in [cubical_complexes.Torus(),
+                    cubical_complexes.KleinBottle(),
+                    cubical_complexes.RealProjectivePlane(),
+                    cubical_complexes.SurfaceOfGenus(2, orientable=False)]:
+        dims = range(complex.dimension() + 1)
+        expected = sparse_smith.integral_homology(complex, dims)
+        assert sparse_smith.screened_homology(complex, dims) == expected
+        assert sparse_smith.screened_homology(
+            complex, dims, processes=2) == expected
+    # Z/2 torsion is not detected without the prime 2, but the matrix is
+    # not proven free of torsion either
+    RP2 = cubical_complexes.RealProjectivePlane()
+    with pytest.warns(RuntimeWarning):
+        assert sparse_smith.screened_homology(RP2, [1], primes=(3,)) == {
+            1: (0, [])}
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12),
+                  strategies.sampled_from([0, 2, 3]))
+def test_betti_numbers(cubes, characteristic):
+    """ Betti numbers from ranks agree with the elementary divisors """
+    complex = CubicalComplex(cubes)
+    dims = range(complex.dimension() + 1)
+    groups = sparse_smith.integral_homology(complex, dims)
+    betti = sparse_smith.betti_numbers(complex, dims,
+                                       characteristic=characteristic)
+    for dim in dims:
+        # the universal coefficient theorem
+        (free, torsion) = groups[dim]
+        below = groups[dim - 1][1] if dim > 0 else []
+        expected = free
+        if characteristic:
+            expected += len([t for t in torsion + below
+                             if t % characteristic == 0])
+        assert betti[dim] == expected
+
+
+@hypothesis.given(strategies.lists(small_cube(), min_size=1, max_size=12))
+def test_boundary_divisors(cubes):
+    """ Elementary divisors of boundary matrices of cubical complexes """
+    complex = CubicalComplex(cubes)
+    for dim in range(1, complex.dimension() + 1):
+        mat = complex._boundary_matrix(dim)
+        assert (sparse_smith.elementary_divisors(mat) ==
+                dense_elementary_divisors(mat.toarray()))
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["sparse", "screened", "coreduction", "morse", "reduction"])
+def test_no_integral_cohomology(algorithm):
+    """ The integral engines refuse cohomology rather than return homology """
+    RP2 = cubical_complexes.RealProjectivePlane()
+    with pytest.raises(NotImplementedError):
+        RP2.homology(algorithm=algorithm, cohomology=True)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Structured tracing of the hot loops of collapses and complex generation.
+
+Functions which support tracing take a trace argument, None by default. When
+it is None they do nothing more than test it once per step, and build no
+messages; when it is a Trace, they count events by key and time their
+phases.
+
+    >>> trace = Trace()
+    >>> with phase(trace, "work"):
+    ...     trace.count("steps", 1)
+    ...     trace.count("steps", 1)
+    >>> dict(trace.counters["steps"])
+    {1: 2}
+    >>> sorted(trace.timings)
+    ['work']
+"""
+from __future__ import absolute_import
+
+import collections
+import time
+
+
+class Trace(object):
+    """ Counters and phase timings of a run
+
+    self.counters maps the name of each kind of event to a Counter of its
+    keys, such as dimensions, and self.timings maps the name of each phase to
+    the time spent in it, in seconds.
+    """
+    def __init__(self):
+        self.counters = collections.defaultdict(collections.Counter)
+        self.timings = collections.defaultdict(float)
+
+    def count(self, name, key, n=1):
+        """ Count n events of kind name for key """
+        self.counters[name][key] += n
+
+    def __repr__(self):
+        counters = dict((name, dict(counter))
+                        for (name, counter) in self.counters.items())
+        return "Trace(counters={}, timings={})".format(
+            counters, dict(self.timings))
+
+
+class _Phase(object):
+    """ Adds the time spent in a with block to a phase of a trace """
+    def __init__(self, trace, name):
+        self._trace = trace
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._trace.timings[self._name] += time.time() - self._start
+        return False
+
+
+class _NoPhase(object):
+    """ A with block which does nothing """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(trace, name):
+    """ A context manager timing a phase of trace, which does nothing if
+    trace is None """
+    if trace is None:
+        return _NO_PHASE
+    return _Phase(trace, name)